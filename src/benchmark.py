@@ -0,0 +1,244 @@
+"""
+Benchmark of the read methods (estimators) over simulated or recorded raw data
+
+For every estimator and dataset it reports:
+- CPU time per output of the estimator: the data is clocked out of the simulated
+  chip once beforehand and then fed to HX711 as is, so the (much higher) cost
+  of simulating the chip is not included; it is reported separately
+- samples consumed per output (x sample period = time per output)
+- noise: standard deviation of the outputs in grams (constant load)
+- step-response latency: samples from a load step until the output stays within tolerance
+- spike rejection: largest error in grams on a constant load with spikes
+
+    python benchmark.py                 # simulated datasets
+    python benchmark.py run.hx711       # + recorded dataset (see recorder.py), noise/CPU only
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import random
+import statistics
+import sys
+import time
+
+from hx711     import HX711
+from hx711_sim import SimulatedGPIO, SimulatedHX711
+from filters   import FIR, Kalman
+from gpio_backend import GPIOBackend
+
+OFFSET = 8629364.553 # calibration_data.txt
+RATIO  = 1663.128
+NOISE  = 300         # counts, ~0.2 g
+STEP   = 100         # grams
+TOLERANCE = 0.5      # grams, step response settled
+CHECK  = 8           # samples compared with the data in preread()
+
+
+class PrereadGPIO(GPIOBackend):
+    """ Always ready chip returning data words read beforehand, see preread() """
+
+    def __init__(self, words):
+        self._next = iter(words).__next__ # StopIteration when exhausted
+
+
+    def setup(self, pin, mode, pull_up_down=None):
+        pass
+
+
+    def output(self, pin, value):
+        pass
+
+
+    def input(self, pin):
+        return 0
+
+
+    def shift_in(self, dout, pd_sck, pulses=25):
+        return self._next()
+
+
+# Estimators: estimator(hx, state) -> sensor data; state is a dict, new for each run
+
+def loop_1(hx, state):
+    """
+    example.py loop_1(): average of the latest 4 read_average_LPF() values
+    """
+    samples = state.setdefault("samples", [])
+    samples.append(hx.read_average_LPF())
+    del samples[:-4]
+    return sum(samples) / len(samples)
+
+
+def sliding(hx, state):
+    if hx.WINDOW is None:
+        hx.set_window(25)
+    return hx.read_sliding_no_spikes()
+
+
+def filtered(stage):
+    def read(hx, state):
+        if hx.FILTER is None:
+            hx.set_filter(stage())
+        return hx.read_filtered()
+    return read
+
+
+ESTIMATORS = [
+    ("read_average(16)",           lambda hx, state: hx.read_average(16)),
+    ("read_average_no_spikes(25)", lambda hx, state: hx.read_average_no_spikes(25)),
+    ("read_average_LPF()",         lambda hx, state: hx.read_average_LPF()),
+    ("example.loop_1",             loop_1),
+    ("read_sliding_no_spikes(25)", sliding),
+    ("read_filtered(FIR)",         filtered(lambda: FIR([1, 2, 4, 8, 16, 8, 4, 2, 1]))),
+    ("read_filtered(Kalman)",      filtered(lambda: Kalman(q=100, r=NOISE**2))),
+    ("read_precise(0.5)",          lambda hx, state: hx.read_precise(0.5)),
+]
+
+
+def datasets(samples=2000, noise=NOISE, seed=1):
+    """
+    :return {name: (raw sensor data, index of the load step or None, true weight after the step)}
+    """
+    rnd  = random.Random(seed)
+    zero = [OFFSET + rnd.gauss(0, noise) for i in range(samples)]
+    step = samples // 4
+    load = [x + (STEP * RATIO if i >= step else 0) for i, x in enumerate(zero)]
+    spikes = [x + (rnd.choice((-1, 1)) * 30 * RATIO if i % 20 == 10 else 0) for i, x in enumerate(zero)]
+    return {
+        "constant" : (zero,   None, 0),
+        "step"     : (load,   step, STEP),
+        "spikes"   : (spikes, None, 0),
+    }
+
+
+def preread(data):
+    """
+    Clock the data out of the simulated chip once
+    :return data words as sent by the chip, CPU seconds per sample of the simulation
+    """
+    # One extra sample, read by the HX711 constructor
+    chip = SimulatedHX711(5, 6, [data[0]] + list(data), repeat=False, power_down_s=None)
+    hx   = HX711(5, 6, gpio=SimulatedGPIO(chip))
+
+    words = []
+    start = time.process_time()
+    try:
+        while True:
+            words.append(hx.read() ^ 0x800000)
+    except StopIteration: # Data exhausted
+        pass
+    cpu = time.process_time() - start
+
+    # The simulated chip must return the data as is, e.g. not shifted by a bit
+    first    = [w ^ 0x800000 for w in words[:CHECK]]
+    expected = [int(round(x)) for x in data[:len(first)]]
+    if first != expected:
+        raise RuntimeError("Simulated samples do not match the data: %s != %s" % (first, expected))
+    return words, cpu / max(len(words), 1)
+
+
+def run(estimator, words):
+    """
+    Run the estimator until the data words (see preread()) are exhausted
+    :return list of (samples consumed so far, weight in grams), CPU seconds
+    """
+    # One extra word, read by the HX711 constructor
+    hx = HX711(5, 6, gpio=PrereadGPIO(words[:1] + words))
+    hx.set_offset(OFFSET)
+    hx.set_ratios((OFFSET, RATIO))
+
+    consumed = [0]
+    def count(value):
+        consumed[0] += 1
+    hx.add_listener(count)
+
+    outputs = []
+    state   = {}
+    start   = time.process_time()
+    try:
+        while True:
+            value = estimator(hx, state)
+            outputs.append((consumed[0], hx.to_grams(value)))
+    except StopIteration: # Data exhausted
+        pass
+    return outputs, time.process_time() - start
+
+
+def latency(outputs, step, weight):
+    """
+    Samples from the step until the output stays within TOLERANCE of the weight
+    """
+    settled = None
+    for n, grams in outputs:
+        if n <= step:
+            continue
+        if abs(grams - weight) <= TOLERANCE:
+            if settled is None:
+                settled = n - step
+        else:
+            settled = None
+    return settled
+
+
+def benchmark(sets):
+    """
+    :return rows of the report, CPU seconds per sample of the simulated chip
+    """
+    words = {}
+    sim   = []
+    for set_name, (data, step, weight) in sets.items():
+        words[set_name], cpu = preread(data)
+        sim.append(cpu)
+
+    rows = []
+    for name, estimator in ESTIMATORS:
+        row = {"estimator": name}
+        for set_name, (data, step, weight) in sets.items():
+            outputs, cpu = run(estimator, words[set_name])
+            if not outputs:
+                continue
+            grams = [g for n, g in outputs]
+            if set_name == "constant":
+                row["cpu_us"]  = cpu / len(outputs) * 1e6
+                row["samples"] = outputs[-1][0] / float(len(outputs))
+                row["std_g"]   = statistics.pstdev(grams[len(grams)//10:]) # without the start-up
+            elif set_name == "recorded":
+                row["rec_std_g"] = statistics.pstdev(grams[len(grams)//10:])
+            elif step is not None:
+                row["latency"] = latency(outputs, step, weight)
+            elif set_name == "spikes":
+                row["spike_g"] = max(abs(g - weight) for g in grams[len(grams)//10:])
+        rows.append(row)
+    return rows, statistics.mean(sim)
+
+
+def report(rows, sim, rate=80):
+    columns = [("estimator", "%-28s", "estimator"), ("cpu_us", "%12.1f", "CPU us/out"),
+               ("samples", "%10.1f", "samples/out"), ("seconds", "%10.3f", "s/out@%d" % rate),
+               ("std_g", "%10.3f", "noise g"), ("latency", "%10s", "step smp"),
+               ("spike_g", "%10.2f", "spike g"), ("rec_std_g", "%10.3f", "rec noise g")]
+    print( " ".join(("%-28s" if key == "estimator" else "%12s") % title for key, fmt, title in columns) )
+    for row in rows:
+        if "samples" in row:
+            row["seconds"] = row["samples"] / rate
+        cells = []
+        for key, fmt, title in columns:
+            value = row.get(key)
+            cell  = "-" if value is None else fmt % value
+            cells.append(("%-28s" if key == "estimator" else "%12s") % cell.strip())
+        print( " ".join(cells) )
+    print( "" )
+    print( "CPU us/out: estimator only; reading a sample from the simulated chip costs %.1f us more" % (sim * 1e6) )
+
+
+##################################
+
+if __name__ == "__main__":
+    sets = datasets()
+    if len(sys.argv) > 1:
+        from recorder import Replay
+        counts = [record[1] for record in Replay(sys.argv[1])]
+        sets["recorded"] = (counts, None, None)
+    report(*benchmark(sets))
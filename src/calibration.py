@@ -27,22 +27,30 @@ import time
 import sys
 from hx711   import HX711
 from hx711_2 import HX711_2
+from calibration_fit import CalibrationModel
 
 # Contain tuples of (reference weight, measured offset, calculated ratio)
 mylist   = []
 offset   = 0
 avrg     = 0
 filename = "calibration_data.txt"
+model_filename = "calibration_model.txt"
 
 hx = HX711(dout=5, pd_sck=6)
 #hx = HX711(dout=20, pd_sck=21)
 #hx = HX711_2(dout_1=5, pd_sck_1=6, dout_2=20, pd_sck_2=21)
 
 
+def aoffset():
+    """ Offset of sensor 2, HX711_2 only
+    """
+    return getattr(hx, 'AOFFSET', 0)
+
+
 def cleanAndExit():
-    print "Cleaning..."
+    print( "Cleaning..." )
     GPIO.cleanup()
-    print "Bye!"
+    print( "Bye!" )
     sys.exit()
 
 
@@ -52,7 +60,7 @@ def loop():
     idx = 0
     samples = [0, 0, 0, 0]
 
-    print 'Samples                                                         Average   Offset Sen 2'
+    print( 'Samples                                                         Average   Offset Sen 2' )
 
     try:
         hx.reset()
@@ -60,10 +68,10 @@ def loop():
         for i in range(4):
             samples[i] = hx.read_average_LPF() # including running average
 #            samples[i] = hx.read_average_no_spikes(times=9) # Try as well?
-            print samples[i], ',',
+            print( samples[i], ',', end=' ' )
 
         avrg = (samples[0] + samples[1] + samples[2] + samples[3]) / 4.0
-        print '        ', avrg, '        ', hx.AOFFSET
+        print( '        ', avrg, '        ', aoffset() )
 
     except (KeyboardInterrupt, SystemExit):
         cleanAndExit()
@@ -74,8 +82,8 @@ def set_data( ref_weight, measured_value, offset ):
         print( "Reference weight cannot be 0" )
         return
     ratio   = round((measured_value - offset)     / ref_weight, 3)
-    ratio_2 = round((measured_value - hx.AOFFSET) / ref_weight, 3)           # For 2 sensors
-#    mylist.append((ref_weight, measured_value, ratio, hx.AOFFSET, ratio_2)) # for 2 sensors
+    ratio_2 = round((measured_value - aoffset()) / ref_weight, 3)           # For 2 sensors
+#    mylist.append((ref_weight, measured_value, ratio, aoffset(), ratio_2)) # for 2 sensors
     mylist.append((ref_weight, measured_value, ratio))
 
 
@@ -83,20 +91,29 @@ def write_data():
     """ Store the measured offsets/calculated ratios to file
     """
     with open(filename, 'w') as f:
-        f.write('\n'.join('%s, %s, %s' % x for x in mylist))
+        f.write('\n'.join('%s, %s, %s' % x[:3] for x in mylist)) # the 0 weight entry has the sensor 2 fields too
 #        f.write('\n'.join('%s, %s, %s, %s, %s' % x for x in mylist)) # for 2 sensors
-        print "Data written to:", filename
+        print( "Data written to:", filename )
+
+
+def fit_data():
+    """ Least squares fit of all reference points, store the coefficients
+    """
+    model = CalibrationModel.fit([(x[0], x[1]) for x in mylist], degree=1)
+    model.save(model_filename)
+    print( model.report() )
+    print( "Model written to:", model_filename )
 
 
 def initial_offset():
     global offset
     global mylist
 
-    print "First measurement without a reference weight, press 'Enter' when ready"
-    q = raw_input()
+    print( "First measurement without a reference weight, press 'Enter' when ready" )
+    q = input()
     loop()
     offset = round(avrg, 3)
-    mylist.append((0, offset, 1, hx.AOFFSET, 1))
+    mylist.append((0, offset, 1, aoffset(), 1))
 
 
 ##################################
@@ -107,11 +124,12 @@ if __name__ == "__main__":
 
     while True:
         print( "Enter the reference weight being used and press 'Enter' when ready, 'q' for quit" )
-        q = raw_input()
+        q = input()
 
         if q == 'q':
             write_data()
             print( mylist )
+            fit_data()
             cleanAndExit()
 
         elif q.replace('.','',1).isdigit(): # works for positive int and float
@@ -0,0 +1,195 @@
+"""
+Least squares calibration model
+
+Fits grams = c0 + c1 x + c2 x^2 + ... (x = raw sensor data - offset) to all
+(reference weight, measured value) points recorded by calibration.py, instead
+of a ratio per point (calibration_table.py). Measurement noise of a single
+reference point is averaged out over all of them, and a conversion is one
+multiply-add for the linear model, with no table search:
+
+    model = CalibrationModel.from_file("calibration_data.txt", degree=1)
+    print( model.report() )         # coefficients, residuals, expected error per range
+    model.save("calibration_model.txt")
+
+    hx.set_model(CalibrationModel.load("calibration_model.txt"))
+    hx.tare()                       # moves the offset, the model is kept
+
+The expected error of a range is the standard error of the fitted weight at the
+ends of the range (from the residual scatter), next to the largest residual of
+its reference points.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+
+
+def _solve(A, b):
+    """
+    Solve A x = b by Gaussian elimination with partial pivoting (small systems)
+    """
+    n = len(A)
+    M = [list(row) + [v] for row, v in zip(A, b)]
+    for i in range(n):
+        p = max(range(i, n), key=lambda r: abs(M[r][i]))
+        if M[p][i] == 0:
+            raise ValueError("Not enough distinct calibration points for the degree")
+        M[i], M[p] = M[p], M[i]
+        for r in range(i + 1, n):
+            f = M[r][i] / M[i][i]
+            for c in range(i, n + 1):
+                M[r][c] -= f * M[i][c]
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (M[i][n] - sum(M[i][c] * x[c] for c in range(i + 1, n))) / M[i][i]
+    return x
+
+
+class CalibrationModel:
+
+    def __init__(self, coeffs, offset=0.0):
+        """
+        :param coeffs: [c0, c1, ...], grams = c0 + c1 x + c2 x^2 + ..., x = value - offset
+        :param offset: measured value at 0 grams
+        """
+        self.COEFFS = [float(c) for c in coeffs]
+        self.OFFSET = float(offset)
+        self.DEGREE = len(self.COEFFS) - 1
+
+        # Linear model: grams = x * SCALE + BIAS
+        self.BIAS  = self.COEFFS[0]
+        self.SCALE = self.COEFFS[1] if self.DEGREE >= 1 else 0.0
+
+        # Set by fit()
+        self.POINTS    = [] # (reference weight, measured value)
+        self.RESIDUALS = [] # fitted - reference weight, per point
+        self.STD       = None # Standard deviation of the residuals
+        self._xs  = 1.0  # x scaling of the fit
+        self._inv = None # (X^T X)^-1 of the scaled fit
+
+
+    @classmethod
+    def fit(cls, points, degree=1, offset=None):
+        """
+        :param points: (reference weight, measured value) pairs, including the 0 weight
+        :param degree: 1 - linear, 2 or 3 - polynomial
+        :param offset: measured value at 0 grams, default: the value of the 0 weight point
+        """
+        points = sorted((float(w), float(v)) for w, v in points)
+        n = len(points)
+        if n < degree + 1:
+            raise ValueError("At least %d calibration points are needed for degree %d" % (degree + 1, degree))
+
+        if offset is None:
+            zero   = [v for w, v in points if w == 0]
+            offset = zero[0] if zero else points[0][1]
+
+        # Scale x to ~1 for a well conditioned system
+        xs = max(abs(v - offset) for w, v in points) or 1.0
+        rows = [[((v - offset) / xs) ** k for k in range(degree + 1)] for w, v in points]
+        ys   = [w for w, v in points]
+
+        p   = degree + 1
+        XtX = [[sum(r[i] * r[j] for r in rows) for j in range(p)] for i in range(p)]
+        Xty = [sum(r[i] * y for r, y in zip(rows, ys)) for i in range(p)]
+        a   = _solve(XtX, Xty)
+
+        model = cls([a[k] / xs ** k for k in range(p)], offset)
+        model.POINTS    = points
+        model.RESIDUALS = [model.grams(v - offset) - w for w, v in points]
+        if n > p:
+            model.STD = (sum(r * r for r in model.RESIDUALS) / (n - p)) ** 0.5
+        model._xs  = xs
+        model._inv = [_solve(XtX, [1.0 if i == j else 0.0 for i in range(p)]) for j in range(p)]
+        return model
+
+
+    @classmethod
+    def from_file(cls, filename, degree=1):
+        """
+        Fit all points of a file generated by calibration.py,
+        lines of: reference weight, measured value, ratio
+        """
+        points = []
+        with open(filename) as f:
+            for line in f:
+                if line.strip():
+                    weight, value = [float(x) for x in line.split(',')[:2]]
+                    points.append((weight, value))
+        return cls.fit(points, degree)
+
+
+    def save(self, filename):
+        """
+        One line: offset, c0, c1, ...
+        """
+        with open(filename, 'w') as f:
+            f.write(', '.join(repr(x) for x in [self.OFFSET] + self.COEFFS) + '\n')
+
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            values = [float(x) for x in f.read().split(',')]
+        return cls(values[1:], values[0])
+
+
+    def grams(self, x):
+        """
+        :param x: measured value - offset; a number or a NumPy array
+        """
+        if self.DEGREE == 1:
+            return x * self.SCALE + self.BIAS
+        y = self.COEFFS[-1]
+        for c in reversed(self.COEFFS[:-1]): # Horner
+            y = y * x + c
+        return y
+
+
+    def ratio(self, x):
+        """
+        Local ratio (sensor data per gram) at x = measured value - offset,
+        the equivalent of CalibrationTable.ratio()
+        """
+        slope = sum(k * c * x ** (k - 1) for k, c in enumerate(self.COEFFS) if k > 0)
+        return 1.0 / slope if slope else 1.0
+
+
+    def stderr(self, x):
+        """
+        Standard error of the fitted weight at x = measured value - offset,
+        None without residual degrees of freedom (points <= degree + 1)
+        """
+        if self.STD is None or self._inv is None:
+            return None
+        u = [(x / self._xs) ** k for k in range(self.DEGREE + 1)]
+        q = sum(u[i] * self._inv[i][j] * u[j] for i in range(len(u)) for j in range(len(u)))
+        return self.STD * max(q, 0.0) ** 0.5
+
+
+    def errors(self):
+        """
+        Expected error per range between consecutive reference weights
+        :return list of (from grams, to grams, standard error, largest residual of the two points)
+        """
+        result = []
+        for (w_a, v_a), (w_b, v_b), r_a, r_b in zip(self.POINTS, self.POINTS[1:], self.RESIDUALS, self.RESIDUALS[1:]):
+            se = self.stderr(v_a - self.OFFSET), self.stderr(v_b - self.OFFSET)
+            se = None if None in se else max(se)
+            result.append((w_a, w_b, se, max(abs(r_a), abs(r_b))))
+        return result
+
+
+    def report(self):
+        lines = ["offset: %.3f" % self.OFFSET,
+                 "grams = " + " + ".join("%.9g x^%d" % (c, k) for k, c in enumerate(self.COEFFS)),
+                 "residual std: %s g" % ("-" if self.STD is None else "%.3f" % self.STD),
+                 "",
+                 "%10s %14s %10s" % ("weight", "measured", "residual")]
+        for (w, v), r in zip(self.POINTS, self.RESIDUALS):
+            lines.append("%10.3f %14.3f %10.3f" % (w, v, r))
+        lines += ["", "%10s %10s %10s %10s" % ("from g", "to g", "std err", "max res")]
+        for w_a, w_b, se, res in self.errors():
+            lines.append("%10.3f %10.3f %10s %10.3f" % (w_a, w_b, "-" if se is None else "%.3f" % se, res))
+        return "\n".join(lines)
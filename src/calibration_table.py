@@ -0,0 +1,95 @@
+"""
+Calibration table: ratio as a function of the raw sensor data
+
+Holds any number of (measured sensor data @ reference weight, calculated ratio)
+points, as written by calibration.py. The ratio between two points is linearly
+interpolated, outside of the table the first/last ratio is used. The slope and
+intercept of every segment are precomputed and the segment is found by a binary
+search, so a lookup is O(log n). ratios() converts whole arrays at once (NumPy).
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import bisect
+
+try:
+    import numpy
+except ImportError: # Only needed for the batch conversions
+    numpy = None
+
+
+def as_array(values):
+    """
+    Sensor data as a NumPy float array, without a copy if it is one already
+    """
+    if numpy is None:
+        raise ImportError("numpy is needed for the batch conversions")
+    return numpy.asarray(values, dtype=numpy.float64)
+
+
+class CalibrationTable:
+
+    def __init__(self, points):
+        """
+        :param points: (measured sensor data @ reference weight, calculated ratio) pairs
+        """
+        points = sorted(points)
+        if not points:
+            raise ValueError("At least one calibration point is needed")
+
+        self.POINTS = points
+        self.VALUES = [p[0] for p in points]
+        self.RATIOS = [p[1] for p in points]
+
+        # Segment i: VALUES[i] <= value < VALUES[i+1], ratio = INTERCEPTS[i] + SLOPES[i] * value
+        self.SLOPES     = []
+        self.INTERCEPTS = []
+        for (v_a, r_a), (v_b, r_b) in zip(points, points[1:]):
+            slope = (r_b - r_a) / (v_b - v_a) if v_b != v_a else 0
+            self.SLOPES.append(slope)
+            self.INTERCEPTS.append(r_a - slope * v_a)
+
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Load the table from a file generated by calibration.py,
+        lines of: reference weight, measured value, ratio
+        The line of the 0 reference weight holds the offset and is skipped.
+        """
+        points = []
+        with open(filename) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                weight, value, ratio = [float(x) for x in line.split(',')[:3]]
+                if weight != 0:
+                    points.append((value, ratio))
+        return cls(points)
+
+
+    def __len__(self):
+        return len(self.POINTS)
+
+
+    def ratio(self, value):
+        """
+        Interpolated ratio at the measured value
+        """
+        if value <= self.VALUES[0]:  return self.RATIOS[0]  # out of range
+        if value >= self.VALUES[-1]: return self.RATIOS[-1] # out of range
+
+        i = bisect.bisect_right(self.VALUES, value) - 1
+        return self.INTERCEPTS[i] + self.SLOPES[i] * value
+
+
+    def ratios(self, values):
+        """
+        Vectorized ratio(): interpolated ratios at an array of measured values
+        :param values: NumPy array, array('i'), list, ... of raw sensor data
+        :return NumPy array of ratios
+        """
+        # numpy.interp() clamps to the first/last ratio out of range, same as ratio()
+        return numpy.interp(as_array(values), self.VALUES, self.RATIOS)
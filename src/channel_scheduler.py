@@ -0,0 +1,86 @@
+"""
+Interleaved reading of HX711 channel A and channel B
+
+The PD_SCK pulses of a read select gain/channel of the *next* conversion:
+25 pulses - channel A, gain 128; 26 - channel B, gain 32; 27 - channel A, gain 64.
+After a channel switch the first conversion(s) of the new channel are discarded
+while the input settles. The scheduler reads blocks of conversions per channel,
+so only `settle` conversions are thrown away per switch:
+
+    useful rate = block * (a + b) / (block * (a + b) + 2 * settle) * sample rate
+
+A larger block gives a higher combined sample rate, a smaller one a lower
+latency between the samples of a channel.
+
+    scheduler = ChannelScheduler(hx, ratio=(4, 1))
+    gain, value = scheduler.read() # gain 128: load cell (A), gain 32: reference/temperature bridge (B)
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import math
+
+
+class ChannelScheduler:
+
+    def __init__(self, hx, ratio=(4, 1), gain_a=128, block=1, settle=1):
+        """
+        :param hx: HX711 object
+        :param ratio: (channel A, channel B) samples ratio
+        :param gain_a: gain of channel A, 128 or 64
+        :param block: number of ratio cycles read before switching the channel
+        :param settle: conversions discarded after a channel switch
+        """
+        a, b = ratio
+        if a < 1 or b < 1:
+            raise ValueError("Both channels need a share of the samples")
+        if gain_a not in (128, 64):
+            raise ValueError("Channel A gain must be 128 or 64")
+
+        n = math.gcd(a, b)
+        a, b = a // n * block, b // n * block
+
+        self.HX = hx
+
+        # Conversion plan: (gain, keep the sample)
+        self.PLAN = [(gain_a, False)] * settle + [(gain_a, True)] * a + \
+                    [(32, False)] * settle     + [(32, True)] * b
+        self.POS  = 0 # Plan entry of the conversion returned by the next read
+
+        self.DISCARDED = 0 # Number of discarded conversions
+
+
+    def efficiency(self):
+        """
+        :return fraction of the conversions which are used
+        """
+        return sum(1 for gain, keep in self.PLAN if keep) / float(len(self.PLAN))
+
+
+    def read(self):
+        """
+        Read until the next useful sample
+        :return (gain, sensor data); gain 128 or 64 - channel A, 32 - channel B
+        """
+        hx   = self.HX
+        plan = self.PLAN
+
+        while True:
+            gain, keep = plan[self.POS]
+            self.POS   = (self.POS + 1) % len(plan)
+
+            # The pulses of this read select the conversion after this one
+            hx.set_gain(plan[self.POS][0])
+            value = hx.read()
+
+            # Not in sync with the plan, e.g. after reset(): discard
+            if keep and hx.GAIN_LAST == gain:
+                return gain, value
+            self.DISCARDED += 1
+
+
+    def __iter__(self):
+        while True:
+            yield self.read()
@@ -0,0 +1,187 @@
+"""
+Dynamic (in-motion) weighing of items crossing the scale, e.g. on a conveyor
+
+Each raw sample is checked as it is read (HX711 listener). An item enters when
+the weight rises above `threshold` and leaves once `exit_samples` consecutive
+samples are below `threshold - hysteresis`, so a glitch on the plateau does not
+split the item. The samples in between (glitches included) are fitted:
+- the entry and exit transients are cut off: leading and trailing samples further
+  than `k` noise deviations from the median of the middle half
+- remaining outliers (spikes) in the plateau are rejected the same way
+- a line is fitted to the plateau, the weight is its mean
+
+One Item per crossing is passed to the callback and queued for items().
+The quality (0..1) falls with the standard error of the weight, the drift
+(slope x plateau duration) and the share of rejected samples:
+
+    quality = kept / total / (1 + (stderr / tolerance)^2 + (drift / tolerance)^2)
+
+    weigher = DynamicWeigher(hx, threshold=20, tolerance=1.0)
+    weigher.start()
+    hx.start_acquisition()
+    for item in weigher.items(): print( item.grams, item.quality )
+
+At 80 SPS an item on the platform for 300 ms gives ~24 samples, of which
+typically 10-15 are plateau.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import queue
+import statistics
+import time
+from collections import namedtuple
+
+# start, end: time.monotonic() of entry and exit
+Item = namedtuple("Item", "grams quality stderr slope samples kept start end")
+
+
+def fit_plateau(grams, times, k=3.0, noise=0.5):
+    """
+    :param grams: weights between entry and exit
+    :param times: their timestamps in seconds
+    :param k: samples further than k noise deviations from the plateau are rejected
+    :param noise: minimum noise deviation in grams, the MAD of a short plateau may be ~0
+    :return (weight, standard error, slope in g/s, plateau duration, kept samples) or None
+    """
+    n = len(grams)
+    if n < 3:
+        return None
+
+    middle = grams[n//4 : n - n//4]
+    center = statistics.median(middle)
+    sigma  = max(1.4826 * statistics.median([abs(g - center) for g in middle]), noise)
+    limit  = k * sigma
+
+    # Cut the entry and exit transients
+    first, last = 0, n - 1
+    while first < last and abs(grams[first] - center) > limit:
+        first += 1
+    while last > first and abs(grams[last] - center) > limit:
+        last -= 1
+
+    # Reject spikes within the plateau
+    kept = [(times[i], grams[i]) for i in range(first, last + 1) if abs(grams[i] - center) <= limit]
+    if len(kept) < 2:
+        return None
+
+    # Least squares line g = mean + slope * (t - t_mean)
+    m      = len(kept)
+    t_mean = sum(t for t, g in kept) / m
+    g_mean = sum(g for t, g in kept) / m
+    stt    = sum((t - t_mean)**2 for t, g in kept)
+    slope  = sum((t - t_mean) * (g - g_mean) for t, g in kept) / stt if stt > 0 else 0.0
+
+    if m > 2:
+        residuals = sum((g - g_mean - slope * (t - t_mean))**2 for t, g in kept)
+        stderr = (residuals / (m - 2) / m) ** 0.5
+    else:
+        stderr = sigma / m ** 0.5
+
+    return g_mean, stderr, slope, kept[-1][0] - kept[0][0], m
+
+
+class DynamicWeigher:
+
+    def __init__(self, hx, threshold=20.0, tolerance=1.0, min_samples=5, k=3.0, noise=0.5, callback=None,
+                 hysteresis=5.0, exit_samples=3):
+        """
+        :param hx: HX711 object, tared with the empty platform
+        :param threshold: grams; an item enters the platform above it
+        :param tolerance: grams, target accuracy used for the quality
+        :param min_samples: minimum samples between entry and exit, fewer - ignored (e.g. a knock)
+        :param k, noise: plateau fit parameters, see fit_plateau()
+        :param callback: callback(Item), called in the thread reading the chip
+        :param hysteresis: grams; the item leaves below threshold - hysteresis
+        :param exit_samples: consecutive samples below threshold - hysteresis to leave
+        """
+        self.HX          = hx
+        self.THRESHOLD   = threshold
+        self.TOLERANCE   = tolerance
+        self.MIN_SAMPLES = min_samples
+        self.K           = k
+        self.NOISE       = noise
+        self.CALLBACK    = callback
+        self.HYSTERESIS   = hysteresis
+        self.EXIT_SAMPLES = max(1, exit_samples)
+
+        self.ITEMS   = queue.SimpleQueue()
+        self.REJECTS = 0 # Crossings too short or without a plateau
+
+        self._grams = None # Samples of the item on the platform, None - empty
+        self._times = None
+        self._below = 0    # Consecutive samples below the exit level
+
+
+    def start(self):
+        self._grams = None
+        self._below = 0
+        self.HX.add_listener(self)
+
+
+    def stop(self):
+        self.HX.remove_listener(self)
+
+
+    def __call__(self, count):
+        """
+        Listener, called with each raw sample
+        """
+        grams = self.HX.to_grams(count)
+        now   = time.monotonic()
+
+        if self._grams is None:
+            if grams > self.THRESHOLD: # Entry
+                self._grams = [grams]
+                self._times = [now]
+                self._below = 0
+            return
+
+        # Glitches below the exit level stay in the samples, fit_plateau() rejects them
+        self._grams.append(grams)
+        self._times.append(now)
+        if grams >= self.THRESHOLD - self.HYSTERESIS:
+            self._below = 0
+            return
+        self._below += 1
+        if self._below < self.EXIT_SAMPLES:
+            return
+
+        # Exit, the trailing samples below the exit level are not part of the item
+        n = len(self._grams) - self._below
+        samples, times = self._grams[:n], self._times[:n]
+        self._grams = self._times = None
+        self._item(samples, times)
+
+
+    def _item(self, samples, times):
+        fit = None
+        if len(samples) >= self.MIN_SAMPLES:
+            fit = fit_plateau(samples, times, self.K, self.NOISE)
+        if fit is None:
+            self.REJECTS += 1
+            return
+
+        weight, stderr, slope, duration, kept = fit
+        tol     = float(self.TOLERANCE)
+        drift   = slope * duration
+        quality = kept / float(len(samples)) / (1 + (stderr / tol)**2 + (drift / tol)**2)
+
+        item = Item(weight, quality, stderr, slope, len(samples), kept, times[0], times[-1])
+        self.ITEMS.put(item)
+        if self.CALLBACK is not None:
+            self.CALLBACK(item)
+
+
+    def items(self, timeout=None):
+        """
+        Yield the weighed items
+        :param timeout: seconds to wait for the next item, None - forever; returns on timeout
+        """
+        while True:
+            try:
+                yield self.ITEMS.get(timeout=timeout)
+            except queue.Empty:
+                return
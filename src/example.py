@@ -24,6 +24,8 @@ import time
 import sys
 from hx711   import HX711
 from hx711_2 import HX711_2
+from settling import SettlingDetector
+from calibration_fit import CalibrationModel
 
 hx = HX711(dout=5, pd_sck=6)
 #hx = HX711(dout=20, pd_sck=21)
@@ -62,15 +64,18 @@ def setup():
 #    hx.set_offset(18229794.023)
 #    hx.set_ratios((18268919.776,1565.030), (18320473.491,906.795), (18375631.173,833.355), (18441637.077,847.372))
 
-    # TODO: Only 4 reference weights currently supported; File generated by calibrate.py
+    # All reference weights are used; File generated by calibration.py
     with open("calibration_data.txt") as f:
         mylist = [tuple(map(eval, i.split(','))) for i in f]
         print( mylist )
 
     # TODO: Set DELTA = offset sensor 1 (weight) - offset sensor 2 (idle)
     hx.set_offset(mylist[0][1])
-    hx.set_ratios((mylist[1][1],mylist[1][2]), (mylist[2][1],mylist[2][2]), (mylist[3][1],mylist[3][2]), (mylist[4][1],mylist[4][2]))
-    print hx.RATIOS
+    hx.set_ratios(*[(x[1], x[2]) for x in mylist[1:]])
+    print( hx.RATIOS )
+
+    # Least squares fit of all reference weights; File generated by calibration.py
+#    hx.set_model(CalibrationModel.load("calibration_model.txt"))
 
     hx.tare()
 
@@ -84,19 +89,20 @@ def loop():
 
     while True:
         try:
-            # TODO: Read only once (9, 16, or 25 samples) and calculate the 3 values
-            v_1 = hx.read_average(times=16)
-            v_2 = hx.read_average_no_spikes(times=16)
-            v_3 = hx.read_average_LPF()
+            # Read only once (16 samples) and calculate the 3 values
+            values = hx.read_estimates(times=16)
+            v_1 = values["average"]
+            v_2 = values["no_spikes"]
+            v_3 = values["LPF"]
 
             g_1 = hx.to_grams( v_1 )
             g_2 = hx.to_grams( v_2 )
             g_3 = hx.to_grams( v_3 )
 
-            print hx.round_to(g_1, 0.25), ',', hx.round_to(g_1, 0.5), '        ',
-            print hx.round_to(g_2, 0.25), ',', hx.round_to(g_2, 0.5), '        ',
-            print hx.round_to(g_3, 0.25), ',', hx.round_to(g_3, 0.5), '        ',
-            print hx.round_to((g_1 + g_2 + g_3)/3, 0.25), 'g'
+            print( hx.round_to(g_1, 0.25), ',', hx.round_to(g_1, 0.5), '        ', end=' ' )
+            print( hx.round_to(g_2, 0.25), ',', hx.round_to(g_2, 0.5), '        ', end=' ' )
+            print( hx.round_to(g_3, 0.25), ',', hx.round_to(g_3, 0.5), '        ', end=' ' )
+            print( hx.round_to((g_1 + g_2 + g_3)/3, 0.25), 'g' )
 
 #            time.sleep(1)
             hx.reset()
@@ -118,10 +124,10 @@ def loop_1():
             for i in range(4):
                 samples[i] = hx.read_average_LPF() # including running average
                 samples[i] = hx.to_grams( samples[i] )
-                print hx.round_to(samples[i], 0.25), ',', hx.round_to(samples[i], 0.5)
+                print( hx.round_to(samples[i], 0.25), ',', hx.round_to(samples[i], 0.5) )
 
-            print '                             ',
-            print hx.round_to((samples[0] + samples[1] + samples[2] + samples[3]) / 4, 0.25), 'g'
+            print( '                             ', end=' ' )
+            print( hx.round_to((samples[0] + samples[1] + samples[2] + samples[3]) / 4, 0.25), 'g' )
             """
 
             samples[idx] = hx.read_average_LPF() # TODO: Use the other functions as well?
@@ -129,8 +135,8 @@ def loop_1():
             avrg = (samples[0] + samples[1] + samples[2] + samples[3]) / 4.0
             #avrg = (avrg + samples[idx]) / 2 # Running average
 
-            print hx.round_to(samples[idx], 0.25), ',', hx.round_to(samples[idx], 0.5), '        ',
-            print hx.round_to(avrg, 0.25), ',', hx.round_to(avrg, 0.5), 'g'
+            print( hx.round_to(samples[idx], 0.25), ',', hx.round_to(samples[idx], 0.5), '        ', end=' ' )
+            print( hx.round_to(avrg, 0.25), ',', hx.round_to(avrg, 0.5), 'g' )
 
             idx = (idx + 1) % 4 # modulo counter
 
@@ -139,9 +145,27 @@ def loop_1():
         except (KeyboardInterrupt, SystemExit):
             cleanAndExit()
 
+def loop_2():
+    """
+    Print the weight as soon as it is stable
+    """
+    detector = SettlingDetector(window=8, max_std=0.5, max_slope=2.0)
+
+    print( 'Stable weight' )
+
+    while True:
+        try:
+            weight = detector.add( hx.to_grams( hx.read() ) )
+            if weight is not None:
+                print( hx.round_to(weight, 0.25), ',', hx.round_to(weight, 0.5), 'g' )
+
+        except (KeyboardInterrupt, SystemExit):
+            cleanAndExit()
+
 ##################################
 
 if __name__ == "__main__":
     setup()
     #loop()
+    #loop_2()
     loop_1()
@@ -0,0 +1,218 @@
+"""
+Streaming filters for sensor data
+
+Each stage keeps its state across samples and produces at most one output per
+new sample with update(), so no samples are re-read: FIR costs O(kernel size),
+the other stages O(1) per sample. update() returns None when a stage has no
+output for that sample (decimation).
+
+    hx.set_filter(FIR([1, 2, 4, 8, 16, 8, 4, 2, 1]), Decimate(4))
+    value = hx.read_filtered()
+
+    hx.set_filter(Kalman(q=100, r=500**2)) # Low lag on load changes, low noise on static loads
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import math
+from collections import deque
+
+
+class FIR:
+    """ Finite impulse response filter, e.g. the KERNEL of HX711.read_average_LPF() """
+
+    def __init__(self, kernel):
+        """
+        :param kernel: weights, the first one applies to the oldest sample
+        """
+        self.KERNEL = list(kernel)
+        self.NORM   = float(sum(self.KERNEL))
+        self.reset()
+
+
+    def reset(self):
+        self._window = deque(maxlen=len(self.KERNEL))
+
+
+    def update(self, x):
+        window = self._window
+        if not window: # Start from steady state, no transient from 0
+            window.extend([x] * window.maxlen)
+        else:
+            window.append(x)
+        return sum([k*v for (k, v) in zip(self.KERNEL, window)]) / self.NORM
+
+
+class EMA:
+    """ Exponential moving average, HX711.read_running_average() is EMA(0.5) """
+
+    def __init__(self, alpha=0.5):
+        """
+        :param alpha: weight of the new sample, 0 < alpha <= 1
+        """
+        self.ALPHA = alpha
+        self.reset()
+
+
+    def reset(self):
+        self._y = None
+
+
+    def update(self, x):
+        if self._y is None:
+            self._y = float(x)
+        else:
+            self._y += self.ALPHA * (x - self._y)
+        return self._y
+
+
+class Biquad:
+    """ Second order IIR filter (transposed direct form II) """
+
+    def __init__(self, b0, b1, b2, a1, a2):
+        """
+        y[n] = b0 x[n] + b1 x[n-1] + b2 x[n-2] - a1 y[n-1] - a2 y[n-2]
+        """
+        self.B = (b0, b1, b2)
+        self.A = (a1, a2)
+        self.reset()
+
+
+    @classmethod
+    def lowpass(cls, cutoff, rate, q=1/math.sqrt(2)):
+        """
+        Low-pass biquad (RBJ Audio EQ Cookbook), Butterworth for the default q
+        :param cutoff: cut-off frequency [Hz]
+        :param rate: sample rate [samples/s], e.g. 10 or 80
+        """
+        w0    = 2 * math.pi * cutoff / rate
+        cos   = math.cos(w0)
+        alpha = math.sin(w0) / (2 * q)
+        a0    = 1 + alpha
+        return cls((1 - cos) / 2 / a0, (1 - cos) / a0, (1 - cos) / 2 / a0, -2 * cos / a0, (1 - alpha) / a0)
+
+
+    def reset(self):
+        self._z = None
+
+
+    def update(self, x):
+        b0, b1, b2 = self.B
+        a1, a2     = self.A
+
+        if self._z is None: # Start from steady state, no transient from 0
+            y = x * (b0 + b1 + b2) / (1 + a1 + a2)
+            self._z = [y - b0 * x, b2 * x - a2 * y]
+
+        z = self._z
+        y = b0 * x + z[0]
+        z[0] = b1 * x - a1 * y + z[1]
+        z[1] = b2 * x - a2 * y
+        return y
+
+
+class Kalman:
+    """
+    1-D Kalman filter, constant weight with random walk (process noise).
+    Load changes are detected from consecutive large innovations, the estimate
+    then jumps to the new load instead of slowly converging; a single spike is ignored.
+    Set r to the variance of read() at a constant load (e.g. RunningStats), and
+    q to how much the load may drift between two samples (variance).
+    """
+
+    def __init__(self, q=100.0, r=250000.0, step=4.0, step_samples=2):
+        """
+        :param q: process noise variance [counts^2 per sample]
+        :param r: measurement noise variance [counts^2]
+        :param step: innovation, in standard deviations, counted as a load change; None - no detection
+        :param step_samples: consecutive load change samples needed for a reset
+        """
+        self.Q = q
+        self.R = r
+        self.STEP = step
+        self.STEP_SAMPLES = step_samples
+        self.reset()
+
+
+    def reset(self):
+        self.X = None # Estimate
+        self.P = None # Variance of the estimate
+        self._steps = []
+
+
+    def update(self, z):
+        if self.X is None:
+            self.X = float(z)
+            self.P = self.R
+            return self.X
+
+        P = self.P + self.Q
+        innovation = z - self.X
+
+        if self.STEP is not None and innovation * innovation > self.STEP * self.STEP * (P + self.R):
+            self._steps.append(z)
+            if len(self._steps) < self.STEP_SAMPLES:
+                return self.X # Possibly a spike, keep the estimate
+            # Load change: restart from the new samples
+            self.X = sum(self._steps) / float(len(self._steps))
+            self.P = self.R / len(self._steps)
+            self._steps = []
+            return self.X
+
+        self._steps = []
+        K = P / (P + self.R)
+        self.X += K * innovation
+        self.P  = (1 - K) * P
+        return self.X
+
+
+class Decimate:
+    """ Output one value per `factor` samples """
+
+    def __init__(self, factor, average=True):
+        """
+        :param factor: number of samples per output
+        :param average: output the mean of the samples, else the last one
+        """
+        self.FACTOR  = factor
+        self.AVERAGE = average
+        self.reset()
+
+
+    def reset(self):
+        self._n   = 0
+        self._sum = 0
+
+
+    def update(self, x):
+        self._n   += 1
+        self._sum += x
+        if self._n < self.FACTOR:
+            return None
+
+        y = self._sum / float(self.FACTOR) if self.AVERAGE else x
+        self._n   = 0
+        self._sum = 0
+        return y
+
+
+class Pipeline:
+    """ Stages applied in order """
+
+    def __init__(self, *stages):
+        self.STAGES = list(stages)
+
+
+    def reset(self):
+        for stage in self.STAGES:
+            stage.reset()
+
+
+    def update(self, x):
+        for stage in self.STAGES:
+            x = stage.update(x)
+            if x is None:
+                return None
+        return x
@@ -0,0 +1,196 @@
+"""
+GPIO backends for the HX711 classes
+
+HX711, HX711_2 and HX711Array read the chips through a backend: the RPi.GPIO
+like setmode(), setup(), output(), input(), wait_for_edge() and cleanup()
+(plus the BCM/IN/OUT/FALLING constants), and the frame clocking shift_in(),
+shift_in_many() and shift_in_timed() implemented here on top of them.
+A backend passed as `gpio=` should subclass GPIOBackend, e.g. the RPiGPIO
+wrapper below (default on a Raspberry Pi), MMapGPIO in gpio_mmap.py or
+SimulatedGPIO in hx711_sim.py (for running off-device). Any other object with
+the RPi.GPIO functions, e.g. the RPi.GPIO module itself, is wrapped by
+as_backend() and gets the generic bit-banged clocking.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import time
+
+
+class GPIOBackend:
+    """ Base class, documents the interface used by the HX711 classes """
+
+    BCM  = 11
+    IN   = 1
+    OUT  = 0
+    LOW  = 0
+    HIGH = 1
+    FALLING = 32
+
+    def setmode(self, mode):
+        pass
+
+
+    def setup(self, pin, mode, pull_up_down=None):
+        raise NotImplementedError
+
+
+    def output(self, pin, value):
+        raise NotImplementedError
+
+
+    def input(self, pin):
+        raise NotImplementedError
+
+
+    def cleanup(self):
+        pass
+
+
+    def wait_for_edge(self, pin, edge, timeout=None):
+        """
+        Emulated by polling the pin level, backends with edge detection should override it
+        :param timeout: in milliseconds, None - wait forever
+        :return pin, or None on timeout
+        """
+        level    = 0 if edge == self.FALLING else 1
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000.0
+        while self.input(pin) != level:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.0001)
+        return pin
+
+
+    def shift_in(self, dout, pd_sck, pulses=25):
+        """
+        Clock a data frame out of the HX711
+        :param dout: Serial Data Output pin
+        :param pd_sck: Power Down and Serial Clock Input pin
+        :param pulses: 25, 26 or 27 PD_SCK pulses, select the gain of the next conversion
+        :return 24 bit data word as sent by the chip
+        """
+        output = self.output
+        input  = self.input
+        count  = 0
+
+        for i in range(24):
+            count = count << 1
+            output(pd_sck, True)
+            output(pd_sck, False)
+            # Read after falling edge
+            if input(dout) == 1:
+                count += 1
+
+        for i in range(pulses - 24):
+            output(pd_sck, True)
+            output(pd_sck, False)
+
+        return count
+
+
+    def shift_in_timed(self, dout, pd_sck, pulses=25):
+        """
+        shift_in() measuring the PD_SCK high pulses, used by the instrumentation
+        (see instrumentation.py); slower, as each pulse is timed
+        :return (24 bit data word, longest high pulse in seconds)
+        """
+        output = self.output
+        input  = self.input
+        clock  = time.perf_counter
+        count  = 0
+        high   = 0.0
+
+        for i in range(pulses):
+            t = clock()
+            output(pd_sck, True)
+            output(pd_sck, False)
+            t = clock() - t
+            if t > high:
+                high = t
+            if i < 24:
+                # Read after falling edge
+                count = (count << 1) | input(dout)
+
+        return count, high
+
+
+    def shift_in_many(self, douts, pd_sck, pulses=25):
+        """
+        Clock data frames out of several HX711 chips sharing one PD_SCK line,
+        all DOUT pins are sampled after each falling edge
+        :return list of 24 bit data words, one per DOUT pin
+        """
+        output = self.output
+        input  = self.input
+        counts = [0] * len(douts)
+        chans  = range(len(douts))
+
+        for i in range(24):
+            output(pd_sck, True)
+            output(pd_sck, False)
+            # Read after falling edge
+            for c in chans:
+                counts[c] = (counts[c] << 1) | input(douts[c])
+
+        for i in range(pulses - 24):
+            output(pd_sck, True)
+            output(pd_sck, False)
+
+        return counts
+
+
+class RPiGPIO(GPIOBackend):
+    """ Thin wrapper around RPi.GPIO """
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.BCM  = GPIO.BCM
+        self.IN   = GPIO.IN
+        self.OUT  = GPIO.OUT
+        self.FALLING = GPIO.FALLING
+
+        # Bind the module functions directly, no extra call level in read()
+        self.setmode = GPIO.setmode
+        self.setup   = GPIO.setup
+        self.output  = GPIO.output
+        self.input   = GPIO.input
+        self.cleanup = GPIO.cleanup
+        self.wait_for_edge = GPIO.wait_for_edge
+
+
+class GPIOWrapper(GPIOBackend):
+    """ GPIOBackend around an object providing (some of) its functions, e.g. the RPi.GPIO module """
+
+    def __init__(self, gpio):
+        self.GPIO = gpio
+        for name in ("BCM", "IN", "OUT", "LOW", "HIGH", "FALLING"):
+            if hasattr(gpio, name):
+                setattr(self, name, getattr(gpio, name))
+        for name in ("setmode", "setup", "output", "input", "cleanup", "wait_for_edge",
+                     "shift_in", "shift_in_many", "shift_in_timed"):
+            if hasattr(gpio, name): # Else the GPIOBackend default, e.g. bit-banged shift_in()
+                setattr(self, name, getattr(gpio, name))
+
+
+def as_backend(gpio=None):
+    """
+    Backend used by the HX711 classes for their `gpio=` argument
+    :param gpio: None - default_backend(); a GPIOBackend; or an object with the RPi.GPIO functions
+    """
+    if gpio is None:
+        return default_backend()
+    if isinstance(gpio, GPIOBackend):
+        return gpio
+    return GPIOWrapper(gpio)
+
+
+def default_backend():
+    """
+    Return the backend used when none is passed to the HX711 classes
+    """
+    return RPiGPIO()
@@ -44,52 +44,86 @@ Unit conversion:
 0g = 0kg = 0oz = 0pound
 1000g = 1kg = 35.274oz = 2.20462 pound
 """
-import RPi.GPIO as GPIO
+import asyncio
 import time
 import sys
 import statistics
+import threading
+
+from gpio_backend import as_backend
+from ready_wait   import ReadyWaiter
+from calibration_table import CalibrationTable, as_array, numpy
+from ring_buffer  import RingBuffer
+from sliding_window import SlidingWindow
+from running_stats  import RunningStats
+from settling       import SettlingDetector
+from filters        import FIR, Pipeline
+from instrumentation import ReadStats, timed_read
+from triggers       import TriggerSet
 
 
 class HX711:
 
-    def __init__(self, dout, pd_sck, gain=128):
+    # Gain -> PD_SCK pulses after the 24 data bits, selecting the gain of the next conversion
+    GAINS  = {128: 1, 64: 3, 32: 2}
+    PULSES = {1: 128, 3: 64, 2: 32}
+
+    def __init__(self, dout, pd_sck, gain=128, gpio=None, wait="poll", timeout=None):
         """
         Set GPIO Mode, and pin for communication with HX711
         :param dout: Serial Data Output pin
         :param pd_sck: Power Down and Serial Clock Input pin
         :param gain: set gain 128, 64, 32
+        :param gpio: GPIO backend (see gpio_backend.py), default RPi.GPIO
+        :param wait: wait for data ready by "poll", "edge" or "sleep" (see ready_wait.py)
+        :param timeout: seconds to wait for data ready, None - wait forever
         """
+        self.GPIO = as_backend(gpio)
+
         self.GAIN   = 1 # default = 128
         self.OFFSET = 0
         self.RATIO  = 1
-        self.RATIOS = [(0,1) for _ in range(4)] # (measured sensor data @ reference weight), calculated ratio)
+        self.RATIOS = [(0,1)] # (measured sensor data @ reference weight), calculated ratio)
+        self.TABLE  = CalibrationTable(self.RATIOS)
+        self.MODEL  = None # Least squares model, replaces RATIO(S), see set_model()
 
         self.DELTA  = 0 # TODO: used in case of 2 sensors
 
-        # Low-pass Filter
-        self.KERNEL = [1, 2, 4, 8, 16, 8, 4, 2, 1]
-        # self.KERNEL = [1, 2, 4, 8, 16, 32] # TODO
-        self.KSIZE  = len(self.KERNEL)
-        self.NORM   = sum(self.KERNEL)
+        # Low-pass Filter, see set_kernel()
+        self.set_kernel([1, 2, 4, 8, 16, 8, 4, 2, 1])
+
+        # Streaming filter pipeline, see set_filter()
+        self.FILTER = None
 
         # Used to keep average sensor data
         self.AVALUE = 0; # Initial value set in tare()
 
-        # Note: Only gain=128 is supported
-        """
-        try:
-            if gain is 128:
-                self.GAIN = 1
-            elif gain is 64:
-                self.GAIN = 3
-            elif gain is 32:
-                self.GAIN = 2
-        except:
-            # Sets default GAIN
-            self.GAIN = 1
-        """
+        # Statistics of the last read_precise()
+        self.PRECISE = None
+
+        # Called with every raw sample read from the chip, see add_listener()
+        self.LISTENERS = []
+
+        # Read path instrumentation, see enable_stats()
+        self.STATS = None
+
+        # Triggers checked on every raw sample, see add_trigger()
+        self.TRIGGERS = None
+
+        # Sliding window for streaming spike removal, see read_sliding_no_spikes()
+        self.WINDOW = None
+
+        # Background acquisition, see start_acquisition()
+        self.BUFFER = None
+        self.THREAD = None
+
+        # Channel A: gain 128 or 64, channel B: gain 32
+        self.set_gain(gain)
+        self.GAIN_NEXT = 128 # Gain of the running conversion, i.e., of the data returned by read()
+        self.GAIN_LAST = 128 # Gain of the data last returned by read()
 
         # Setup the gpio pin numbering system
+        GPIO = self.GPIO
         GPIO.setmode(GPIO.BCM)
 
         # Set the pin numbers
@@ -103,11 +137,41 @@ class HX711:
 #        GPIO.setup(self.DOUT, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.setup(self.DOUT, GPIO.IN)
 
+        self.WAITER = ReadyWaiter(GPIO, self.DOUT, wait, timeout)
+
         # Power up the chip
         self.reset()
         self.AVALUE = self.read() # In case tare() is not called
 
 
+    def set_gain(self, gain):
+        """
+        Set gain and channel: 128 or 64 - channel A, 32 - channel B.
+        Note: The gain applies to the conversion started by the next read(),
+        i.e., the data of the read() after next (see channel_scheduler.py)
+        """
+        if gain not in self.GAINS:
+            raise ValueError("Gain must be 128, 64 or 32")
+        self.GAIN = self.GAINS[gain]
+
+
+    def set_kernel(self, kernel):
+        """
+        Set the low-pass filter kernel of read_average_LPF(), e.g. [1, 2, 4, 8, 16, 32]
+        """
+        self.KERNEL = list(kernel)
+        self.KSIZE  = len(self.KERNEL)
+        self.NORM   = sum(self.KERNEL)
+
+
+    def set_filter(self, *stages):
+        """
+        Set the streaming filter stages of read_filtered(), see filters.py
+        e.g. set_filter(FIR([1, 2, 4, 8, 16, 8, 4, 2, 1]), Decimate(4))
+        """
+        self.FILTER = Pipeline(*stages)
+
+
     def set_offset(self, offset):
         self.OFFSET = offset
 
@@ -116,66 +180,171 @@ class HX711:
         self.RATIO = ratio
 
 
-    def set_ratios(self, ratio_1=(0,1), ratio_2=(0,1), ratio_3=(0,1), ratio_4=(0,1)):
+    def set_ratios(self, *ratios):
+        """
+        Set (measured sensor data @ reference weight, calculated ratio) pairs,
+        any number of them, e.g. all points of calibration_data.txt
+        """
+        self.RATIOS = list(ratios)
+        self.TABLE  = CalibrationTable(self.RATIOS)
+
+
+    def set_model(self, model):
         """
-        Set offset - ratio pairs
+        Convert with a least squares calibration model (see calibration_fit.py)
+        instead of the ratios. The offset is set to where the model reads 0 g
+        (until the next tare()), so the model's c0 is not added in to_grams()
+        :param model: CalibrationModel, None - back to the ratios
         """
-        self.RATIOS[0] = ratio_1
-        self.RATIOS[1] = ratio_2
-        self.RATIOS[2] = ratio_3
-        self.RATIOS[3] = ratio_4
+        self.MODEL = model
+        if model is not None:
+            self.OFFSET = model.OFFSET - model.BIAS * model.ratio(0)
 
 
     def get_interpolated_ratio(self, measured_value):
         """
         Linear Interpolation: ratio = ratio_a + (ratio_b - ratio_a) * ((value - value_a) / (value_b - value_a))
-        Assumption: self.RATIOS[X][0] (i.e., raw data @ reference weight) are monotonically increasing
+        See calibration_table.py; with a model, its local ratio
         """
-        if   measured_value <= self.RATIOS[0][0]: return self.RATIOS[0][1] # out of range
-        elif measured_value >= self.RATIOS[3][0]: return self.RATIOS[3][1] # out of range
-        else:
-            idx = 0
-            for i in range(len(self.RATIOS)-1):
-                if self.RATIOS[i][0] < measured_value and measured_value < self.RATIOS[i+1][0]:
-                    idx = i
-                    break
-
-            k = (measured_value - self.RATIOS[i][0]) / (self.RATIOS[i+1][0] - self.RATIOS[i][0])
-            return self.RATIOS[i][1] + k * (self.RATIOS[i+1][1] - self.RATIOS[i][1])
+        if self.MODEL is not None:
+            return self.MODEL.ratio(measured_value - self.MODEL.OFFSET)
+        return self.TABLE.ratio(measured_value)
 
 
     def read(self):
         """
         Read data from the HX711 chip
+        In acquisition mode, wait for the next sample acquired by the background thread
         """
+        if self.THREAD is not None:
+            return self.BUFFER.next()
+        return self._read()
+
 
-        # Control if the chip is ready
-        while GPIO.input(self.DOUT) == 1:
-            pass
+    def _read(self):
+        if self.STATS is not None:
+            count = timed_read(self.STATS, self.GPIO, self.WAITER, self.DOUT, self.PD_SCK, 24 + self.GAIN)
+        else:
+            # Control if the chip is ready
+            self.WAITER.wait()
 
-        # Original C source code ported to Python as described in datasheet
-        # https://cdn.sparkfun.com/datasheets/Sensors/ForceFlex/hx711_english.pdf
-        # Output from python matched the output of different HX711 Arduino library example
-        # Lastly, behavior matches while applying pressure
-        # Please see page 8 of the PDF document
-        count = 0
+            # Original C source code ported to Python as described in datasheet
+            # https://cdn.sparkfun.com/datasheets/Sensors/ForceFlex/hx711_english.pdf
+            # Output from python matched the output of different HX711 Arduino library example
+            # Lastly, behavior matches while applying pressure
+            # Please see page 8 of the PDF document (and GPIOBackend.shift_in())
 
-        for i in range(24):
-            count = count << 1
-            GPIO.output(self.PD_SCK, True)
-            GPIO.output(self.PD_SCK, False)
-            # Read after falling edge
-            if(GPIO.input(self.DOUT) == 1):
-                count += 1
+            # 25 SCKs -> next gain = 128, 26 -> 32, 27 -> 64
+            count = self.GPIO.shift_in(self.DOUT, self.PD_SCK, 24 + self.GAIN)
 
-        # 25 SCKs -> next gain = 128
-        GPIO.output(self.PD_SCK, True)
-        GPIO.output(self.PD_SCK, False)
+        self.GAIN_LAST = self.GAIN_NEXT
+        self.GAIN_NEXT = self.PULSES[self.GAIN]
 
         count = count ^ 0x800000
+        for listener in self.LISTENERS:
+            listener(count)
         return count
 
 
+    def enable_stats(self):
+        """
+        Instrument read(): ready wait, clocking time, PD_SCK high pulses, suspected
+        corrupt frames and sample rate, see self.STATS.snapshot() and self.STATS.prometheus()
+        """
+        self.STATS = ReadStats({"dout": self.DOUT})
+        return self.STATS
+
+
+    def disable_stats(self):
+        self.STATS = None
+
+
+    def add_listener(self, listener):
+        """
+        Call listener(count) with every raw sample read from the chip (in the
+        acquisition thread in acquisition mode), e.g. ZeroTracker
+        """
+        self.LISTENERS = self.LISTENERS + [listener] # Copy, the list may be in use by _read()
+
+
+    def remove_listener(self, listener):
+        self.LISTENERS = [l for l in self.LISTENERS if l is not listener]
+
+
+    def add_trigger(self, trigger):
+        """
+        Check the trigger (see triggers.py) on every raw sample read, its
+        callback runs on the trigger thread
+        """
+        if self.TRIGGERS is None:
+            self.TRIGGERS = TriggerSet(self)
+            self.add_listener(self.TRIGGERS)
+        self.TRIGGERS.add(trigger)
+
+
+    def remove_trigger(self, trigger):
+        if self.TRIGGERS is not None:
+            self.TRIGGERS.remove(trigger)
+
+
+    def start_acquisition(self, size=256):
+        """
+        Read the chip continuously in a background thread into a ring buffer.
+        read_average*() are then calculated from the latest buffered samples
+        instead of waiting for new conversions.
+        :param size: number of buffered samples
+        """
+        if self.THREAD is not None:
+            return
+        self.BUFFER = RingBuffer(size)
+        self.THREAD = threading.Thread(target=self._acquire, args=(self.BUFFER,), name="HX711-%s" % self.DOUT)
+        self.THREAD.daemon = True
+        self.THREAD.start()
+
+
+    def stop_acquisition(self):
+        thread, self.THREAD = self.THREAD, None
+        if thread is not None:
+            thread.join()
+
+
+    def _acquire(self, buffer):
+        error = None
+        try:
+            while self.THREAD is not None:
+                try:
+                    count = self._read()
+                except TimeoutError:
+                    continue
+                buffer.append(count, time.monotonic())
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            buffer.close(error)
+
+
+    def samples(self, times):
+        """
+        Raw sensor data samples, oldest first
+        :param times: number of samples; the latest buffered ones in acquisition mode
+        """
+        if self.THREAD is not None:
+            return self.BUFFER.latest(times).tolist()
+        return [self.read() for i in range(times)]
+
+
+    def running_average(self, values):
+        """
+        Apply the running average (see read_running_average()) to sensor data samples
+        """
+        result = []
+        for value in values:
+            self.AVALUE = (self.AVALUE + value) / 2.0
+            result.append(self.AVALUE)
+        return result
+
+
     def read_running_average(self):
         self.AVALUE = (self.AVALUE + self.read()) / 2.0
         return self.AVALUE
@@ -186,25 +355,142 @@ class HX711:
         Calculate average value from sensor data samples
         :param times: read x samples to get average
         """
-        sum = 0
-        for i in range(times):
-            sum += self.read() # read_running_average()?
-        return sum / times
+        return sum(self.samples(times)) / times # read_running_average()?
 
 
     def read_average_no_spikes(self, times=25):
         """
         Remove spikes
         """
-        cut = times//5 # discard remainder
-        values = sorted([self.read_running_average() for i in range(times)])[cut:-cut]
-        return statistics.mean(values)
+        return self.no_spikes(self.running_average(self.samples(times)))
 
 
     def read_average_LPF(self):
         """
         """
-        values = [self.read_running_average() for i in range(self.KSIZE)]
+        return self.LPF(self.running_average(self.samples(self.KSIZE)))
+
+
+    def set_window(self, size=100, trim=0.2):
+        """
+        Set the sliding window used by read_sliding_no_spikes()
+        :param size: number of samples in the window
+        :param trim: fraction of the samples discarded at each end
+        """
+        self.WINDOW = SlidingWindow(size, trim)
+
+
+    def read_sliding_no_spikes(self, median=False):
+        """
+        Read one sample and remove spikes over the sliding window of the latest samples
+        :param median: return the median instead of the trimmed mean
+        """
+        if self.WINDOW is None:
+            self.set_window()
+        self.WINDOW.add(self.read())
+        return self.WINDOW.median() if median else self.WINDOW.trimmed_mean()
+
+
+    def read_precise(self, tolerance=0.5, confidence=0.95, min_times=4, max_times=64, timeout=None):
+        """
+        Average just as many samples as needed: stop as soon as the mean is within
+        `tolerance` grams at the given confidence, or max_times/timeout is reached.
+        Statistics of the last call are kept in self.PRECISE (RunningStats).
+        :param tolerance: requested precision in grams
+        :param confidence: confidence level of the precision, e.g. 0.95
+        :param min_times: minimum number of samples
+        :param max_times: maximum number of samples
+        :param timeout: seconds, None - no deadline
+        :return average sensor data
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stats    = RunningStats()
+        self.PRECISE = stats
+
+        while stats.N < max_times:
+            stats.add(self.read())
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if stats.N < min_times:
+                continue
+            # Tolerance in sensor data units at the current weight
+            if stats.margin(confidence) <= tolerance * abs(self.get_interpolated_ratio(stats.MEAN)):
+                break
+
+        return stats.MEAN
+
+
+    def read_stable(self, detector=None, timeout=None):
+        """
+        Read until the weight is stable, see settling.py
+        :param detector: SettlingDetector, default: 8 samples, 0.5 g std, 2 g/s slope
+        :param timeout: seconds, None - wait forever
+        :return stable weight in grams, None on timeout
+        """
+        if detector is None:
+            detector = SettlingDetector()
+        detector.reset()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while deadline is None or time.monotonic() < deadline:
+            weight = detector.add(self.to_grams(self.read()))
+            if weight is not None:
+                return weight
+        return None
+
+
+    def read_filtered(self):
+        """
+        Read sample(s) until the filter pipeline outputs a value, one sample per value
+        unless the pipeline decimates. Default pipeline: FIR with KERNEL
+        """
+        if self.FILTER is None:
+            self.set_filter(FIR(self.KERNEL))
+
+        value = None
+        while value is None:
+            value = self.FILTER.update(self.read())
+        return value
+
+
+    def read_estimates(self, times=16):
+        """
+        Read the samples once and calculate the values of the different read methods
+        :param times: number of samples, at least KSIZE
+        :return dict with the values of read_average(), read_average_no_spikes(),
+                read_average_LPF() and read_running_average()
+        """
+        if times < self.KSIZE:
+            raise ValueError("At least %d samples are needed" % self.KSIZE)
+        return self.estimates(self.samples(times))
+
+
+    def estimates(self, values):
+        """
+        Calculate the values of the different read methods from sensor data samples,
+        see read_estimates()
+        """
+        running = self.running_average(values)
+        return {
+            "average"   : sum(values) / len(values),
+            "no_spikes" : self.no_spikes(running),
+            "LPF"       : self.LPF(running[-self.KSIZE:]),
+            "running"   : self.AVALUE
+        }
+
+
+    def no_spikes(self, values):
+        """
+        Mean of the values without the lowest and highest 20%
+        """
+        cut = len(values)//5 # discard remainder
+        return statistics.mean(sorted(values)[cut:-cut])
+
+
+    def LPF(self, values):
+        """
+        Low-pass filter KSIZE values
+        """
         return sum([k*v for (k, v) in zip(self.KERNEL, values)]) / self.NORM
 
 
@@ -213,10 +499,31 @@ class HX711:
         :param value: to be converted to grams
         :return float weight in grams
         """
+        model = self.MODEL
+        if model is not None:
+            if model.DEGREE == 1:
+                return (value - self.OFFSET) * model.SCALE
+            # The curve is evaluated from the model's own zero, the tare point is subtracted
+            return model.grams(value - model.OFFSET) - model.grams(self.OFFSET - model.OFFSET)
         # return (value - self.OFFSET) / self.RATIO
         return (value - self.OFFSET) / self.get_interpolated_ratio( value )
 
 
+    def to_grams_array(self, values):
+        """
+        Vectorized to_grams() (needs NumPy)
+        :param values: NumPy array, array('i'), list, ... of sensor data to be converted
+        :return NumPy array of weights in grams
+        """
+        values = as_array(values)
+        model = self.MODEL
+        if model is not None:
+            if model.DEGREE == 1:
+                return (values - self.OFFSET) * model.SCALE
+            return model.grams(values - model.OFFSET) - model.grams(self.OFFSET - model.OFFSET)
+        return (values - self.OFFSET) / self.TABLE.ratios(values)
+
+
     def round_to(self, value, res):
         """
         Round to e.g., 0.5, 0.02, 10, etc.
@@ -226,12 +533,69 @@ class HX711:
         return res * (round(value/res))
 
 
-    def tare(self, times=16):
+    def round_to_array(self, values, res):
+        """
+        Vectorized round_to() (needs NumPy)
+        """
+        values = as_array(values)
+        if res == 0:
+            return numpy.round(values)
+        return res * numpy.round(values / res)
+
+
+    def tare(self, times=16, tolerance=None):
         """
         Tare functionality for calibration
         :param times: set value to calculate average
+        :param tolerance: if set, average until the offset is within tolerance grams, see read_precise()
+        """
+        if tolerance is not None:
+            self.AVALUE = self.read_precise(tolerance)
+        else:
+            self.AVALUE = self.read_average_no_spikes()
+        self.set_offset(self.AVALUE)
+
+
+    def is_ready(self):
+        """
+        :return True if data is ready to be read (DOUT low)
+        """
+        return self.GPIO.input(self.DOUT) == 0
+
+
+    async def read_async(self):
+        """
+        read() for asyncio: wait for the data without blocking the event loop
+        """
+        if self.THREAD is not None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.BUFFER.next)
+        await self.WAITER.wait_async()
+        return self._read()
+
+
+    async def samples_async(self, times):
+        return [await self.read_async() for i in range(times)]
+
+
+    async def stream_grams(self, times=16, method="no_spikes"):
+        """
+        Weights in grams for asyncio, e.g. async for w in hx.stream_grams(): ...
+        :param times: samples per weight, at least KSIZE
+        :param method: "average", "no_spikes", "LPF" or "running", see read_estimates()
+        """
+        if times < self.KSIZE:
+            raise ValueError("At least %d samples are needed" % self.KSIZE)
+        while True:
+            values = await self.samples_async(times)
+            yield self.to_grams(self.estimates(values)[method])
+
+
+    async def tare_async(self, times=25):
+        """
+        tare() for asyncio
         """
-        self.AVALUE = self.read_average_no_spikes()
+        values = await self.samples_async(times)
+        self.AVALUE = self.no_spikes(self.running_average(values))
         self.set_offset(self.AVALUE)
 
 
@@ -239,17 +603,18 @@ class HX711:
         """
         Power the chip down
         """
-        GPIO.output(self.PD_SCK, False)
-        GPIO.output(self.PD_SCK, True)
+        self.GPIO.output(self.PD_SCK, False)
+        self.GPIO.output(self.PD_SCK, True)
         time.sleep(0.001)
 
     def power_up(self):
         """
         Power the chip up
         """
-        GPIO.output(self.PD_SCK, False)
+        self.GPIO.output(self.PD_SCK, False)
         time.sleep(0.001)
 
     def reset(self):
          self.power_down()
          self.power_up()
+         self.GAIN_NEXT = 128 # After reset the chip converts channel A, gain 128
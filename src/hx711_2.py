@@ -44,21 +44,31 @@ Unit conversion:
 0g = 0kg = 0oz = 0pound
 1000g = 1kg = 35.274oz = 2.20462 pound
 """
-import RPi.GPIO as GPIO
 import time
 import sys
 import statistics
 
+from gpio_backend import as_backend
+from ready_wait   import ReadyWaiter
+from calibration_table import CalibrationTable, as_array, numpy
+from instrumentation   import ReadStats, prometheus_text, timed_read
+
 # TODO: Work in Progress
 
 class HX711_2:
     """ 2 Sensors, Only gain=128 is supported """
 
-    def __init__(self, dout_1, pd_sck_1, dout_2=None, pd_sck_2=None):
+    def __init__(self, dout_1, pd_sck_1, dout_2=None, pd_sck_2=None, gpio=None, wait="poll", timeout=None):
         """
         Set GPIO Mode, and pin for communication with the 2 HX711 chips
+        :param gpio: GPIO backend (see gpio_backend.py), default RPi.GPIO
+        :param wait: wait for data ready by "poll", "edge" or "sleep" (see ready_wait.py)
+        :param timeout: seconds to wait for data ready, None - wait forever
         """
+        self.GPIO = as_backend(gpio)
+
         # Setup the gpio pin numbering system
+        GPIO = self.GPIO
         GPIO.setmode(GPIO.BCM)
 
         # Set the pin numbers
@@ -76,12 +86,18 @@ class HX711_2:
         # Setup the GPIO Pins as output
         GPIO.setup(self.PD_SCK_1, GPIO.OUT)
         GPIO.setup(self.PD_SCK_2, GPIO.OUT)
+
+        self.WAITERS = {
+            self.DOUT_1: ReadyWaiter(GPIO, self.DOUT_1, wait, timeout),
+            self.DOUT_2: ReadyWaiter(GPIO, self.DOUT_2, wait, timeout)
+        }
         # -------------------------------------
 
         self.OFFSET = 0
         self.DELTA  = 0 # DELTA = Offset sensor 1 - Offset sensor 2
         self.RATIO  = 1
-        self.RATIOS = [(0,1) for _ in range(4)] # (measured sensor data @ reference weight), calculated ratio)
+        self.RATIOS = [(0,1)] # (measured sensor data @ reference weight), calculated ratio)
+        self.TABLE  = CalibrationTable(self.RATIOS)
 
         # Low-pass Filter
         self.KERNEL = [1, 2, 4, 8, 16, 8, 4, 2, 1]
@@ -89,6 +105,12 @@ class HX711_2:
         self.KSIZE  = len(self.KERNEL)
         self.NORM   = sum(self.KERNEL)
 
+        # Called with every pair of samples read, see add_listener()
+        self.LISTENERS = []
+
+        # Read path instrumentation per DOUT pin, see enable_stats()
+        self.STATS = None
+
         # Sensor 1 - measure weight; Sensor 2 - measure offset
         # Used to keep the average Sensor 1 data
         self.AVALUE  = 0 # Initial value set in tare()
@@ -101,8 +123,7 @@ class HX711_2:
 
 
     def initialize(self):
-        self.AVALUE  = self.read(self.DOUT_1, self.PD_SCK_1) # In case tare() is not called
-        self.AOFFSET = self.read(self.DOUT_2, self.PD_SCK_2) # In case tare() is not called
+        self.AVALUE, self.AOFFSET = self.read_both() # In case tare() is not called
 
 
     def set_offset(self, offset):
@@ -117,32 +138,21 @@ class HX711_2:
         self.RATIO = ratio
 
 
-    def set_ratios(self, ratio_1=(0,1), ratio_2=(0,1), ratio_3=(0,1), ratio_4=(0,1)):
+    def set_ratios(self, *ratios):
         """
-        Set offset - ratio pairs
+        Set (measured sensor data @ reference weight, calculated ratio) pairs,
+        any number of them, e.g. all points of calibration_data.txt
         """
-        self.RATIOS[0] = ratio_1
-        self.RATIOS[1] = ratio_2
-        self.RATIOS[2] = ratio_3
-        self.RATIOS[3] = ratio_4
+        self.RATIOS = list(ratios)
+        self.TABLE  = CalibrationTable(self.RATIOS)
 
 
     def get_interpolated_ratio(self, measured_value):
         """
         Linear Interpolation: ratio = ratio_a + (ratio_b - ratio_a) * ((value - value_a) / (value_b - value_a))
-        Assumption: self.RATIOS[X][0] (i.e., raw data @ reference weight) are monotonically increasing
+        See calibration_table.py
         """
-        if   measured_value <= self.RATIOS[0][0]: return self.RATIOS[0][1] # out of range
-        elif measured_value >= self.RATIOS[3][0]: return self.RATIOS[3][1] # out of range
-        else:
-            idx = 0
-            for i in range(len(self.RATIOS)-1):
-                if self.RATIOS[i][0] < measured_value and measured_value < self.RATIOS[i+1][0]:
-                    idx = i
-                    break
-
-            k = (measured_value - self.RATIOS[i][0]) / (self.RATIOS[i+1][0] - self.RATIOS[i][0])
-            return self.RATIOS[i][1] + k * (self.RATIOS[i+1][1] - self.RATIOS[i][1])
+        return self.TABLE.ratio(measured_value)
 
 
     def read(self, DOUT, PD_SCK):
@@ -151,31 +161,73 @@ class HX711_2:
         https://cdn.sparkfun.com/datasheets/Sensors/ForceFlex/hx711_english.pdf
         """
 
-        # Wait until the chip is ready
-        while GPIO.input(DOUT) == 1:
-            pass
-
-        count = 0
+        if self.STATS is not None:
+            count = timed_read(self.STATS[DOUT], self.GPIO, self.WAITERS[DOUT], DOUT, PD_SCK, 25)
+            return count ^ 0x800000
 
-        for i in range(24):
-            count = count << 1
-            GPIO.output(PD_SCK, True)
-            GPIO.output(PD_SCK, False)
-            # Read after falling edge
-            if(GPIO.input(DOUT) == 1):
-                count += 1
+        # Wait until the chip is ready
+        self.WAITERS[DOUT].wait()
 
         # 25 SCKs -> next gain = 128
-        GPIO.output(PD_SCK, True)
-        GPIO.output(PD_SCK, False)
+        count = self.GPIO.shift_in(DOUT, PD_SCK, 25)
 
         count = count ^ 0x800000
         return count
 
 
+    def read_both(self):
+        """
+        Read sensor 1 and sensor 2
+        :return (sensor 1 data, sensor 2 data)
+        """
+        value  = self.read(self.DOUT_1, self.PD_SCK_1)
+        offset = self.read(self.DOUT_2, self.PD_SCK_2)
+        for listener in self.LISTENERS:
+            listener(value, offset)
+        return value, offset
+
+
+    def enable_stats(self):
+        """
+        Instrument read() of both chips, see instrumentation.py
+        :return {DOUT pin: ReadStats}
+        """
+        self.STATS = {
+            self.DOUT_1: ReadStats({"dout": self.DOUT_1}),
+            self.DOUT_2: ReadStats({"dout": self.DOUT_2})
+        }
+        return self.STATS
+
+
+    def disable_stats(self):
+        self.STATS = None
+
+
+    def prometheus(self, prefix="hx711"):
+        """
+        Statistics of both chips in Prometheus text exposition format,
+        empty if enable_stats() was not called
+        """
+        if self.STATS is None:
+            return ""
+        return prometheus_text(list(self.STATS.values()), prefix)
+
+
+    def add_listener(self, listener):
+        """
+        Call listener(sensor 1 data, sensor 2 data) with every pair of samples read, e.g. Recorder
+        """
+        self.LISTENERS = self.LISTENERS + [listener]
+
+
+    def remove_listener(self, listener):
+        self.LISTENERS = [l for l in self.LISTENERS if l is not listener]
+
+
     def read_running_average(self):
-        self.AVALUE  = (self.AVALUE  + self.read(self.DOUT_1, self.PD_SCK_1)) / 2.0
-        self.AOFFSET = (self.AOFFSET + self.read(self.DOUT_2, self.PD_SCK_2)) / 2.0
+        value, offset = self.read_both()
+        self.AVALUE  = (self.AVALUE  + value)  / 2.0
+        self.AOFFSET = (self.AOFFSET + offset) / 2.0
         return self.AVALUE
 
 
@@ -190,8 +242,9 @@ class HX711_2:
         self.initialize()
 
         for i in range(times):
-            value  += self.read(self.DOUT_1, self.PD_SCK_1)
-            offset += self.read(self.DOUT_2, self.PD_SCK_2)
+            value_i, offset_i = self.read_both()
+            value  += value_i
+            offset += offset_i
 
         return value/times, offset/times
 
@@ -215,6 +268,39 @@ class HX711_2:
         return sum([k*v for (k, v) in zip(self.KERNEL, values)]) / self.NORM
 
 
+    def read_estimates(self, times=16):
+        """
+        Read the samples once and calculate the values of the different read methods
+        :param times: number of samples, at least KSIZE
+        :return dict with the sensor 1 values of read_average(), read_average_no_spikes(),
+                read_average_LPF() and read_running_average(), and the sensor 2 average
+        """
+        if times < self.KSIZE:
+            raise ValueError("At least %d samples are needed" % self.KSIZE)
+
+        self.initialize()
+
+        value   = 0
+        offset  = 0
+        running = []
+        for i in range(times):
+            value_i, offset_i = self.read_both()
+            value  += value_i
+            offset += offset_i
+            self.AVALUE  = (self.AVALUE  + value_i)  / 2.0
+            self.AOFFSET = (self.AOFFSET + offset_i) / 2.0
+            running.append(self.AVALUE)
+
+        cut = times//5 # discard remainder
+        return {
+            "average"   : value / times,
+            "offset"    : offset / times,
+            "no_spikes" : statistics.mean(sorted(running)[cut:-cut]),
+            "LPF"       : sum([k*v for (k, v) in zip(self.KERNEL, running[-self.KSIZE:])]) / self.NORM,
+            "running"   : self.AVALUE
+        }
+
+
     def to_grams(self, value):
         """
         :param value: to be converted to grams
@@ -229,6 +315,19 @@ class HX711_2:
             return (value - self.AOFFSET) / self.get_interpolated_ratio( value )
 
 
+    def to_grams_array(self, values):
+        """
+        Vectorized to_grams() (needs NumPy)
+        :param values: NumPy array, array('i'), list, ... of sensor data to be converted
+        :return NumPy array of weights in grams
+        """
+        values = as_array(values)
+        if self.RATIO != 1:
+            return (values - self.AOFFSET) / self.RATIO
+        else:
+            return (values - self.AOFFSET) / self.TABLE.ratios(values)
+
+
     def round_to(self, value, res):
         """
         Round to e.g., 0.5, 0.02, 10, etc.
@@ -238,6 +337,16 @@ class HX711_2:
         return res * (round(value/res))
 
 
+    def round_to_array(self, values, res):
+        """
+        Vectorized round_to() (needs NumPy)
+        """
+        values = as_array(values)
+        if res == 0:
+            return numpy.round(values)
+        return res * numpy.round(values / res)
+
+
     def tare(self, times=9):
         """
         Tare functionality for calibration
@@ -252,8 +361,8 @@ class HX711_2:
         """
         Power the chip down
         """
-        GPIO.output(PD_SCK, False)
-        GPIO.output(PD_SCK, True)
+        self.GPIO.output(PD_SCK, False)
+        self.GPIO.output(PD_SCK, True)
         time.sleep(0.001)
 
 
@@ -261,7 +370,7 @@ class HX711_2:
         """
         Power the chip up
         """
-        GPIO.output(PD_SCK, False)
+        self.GPIO.output(PD_SCK, False)
         time.sleep(0.001)
 
 
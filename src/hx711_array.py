@@ -0,0 +1,148 @@
+"""
+N HX711 chips sharing one PD_SCK line (e.g. a platform with 4 load cells)
+
+All chips are clocked by the same PD_SCK pulse train and all DOUT lines are
+sampled on each falling edge, so the N channels are read in the time of one
+and the samples of a read() come from the same conversion cycle.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import time
+import statistics
+
+from gpio_backend import as_backend
+from ready_wait   import ReadyWaiter
+from calibration_table import CalibrationTable
+
+
+class HX711Array:
+    """ N Sensors, one shared clock, Only gain=128 is supported """
+
+    def __init__(self, douts, pd_sck, gpio=None, wait="poll", timeout=None):
+        """
+        Set GPIO Mode, and pins for communication with the HX711 chips
+        :param douts: Serial Data Output pins, one per chip
+        :param pd_sck: Power Down and Serial Clock Input pin, shared by all chips
+        :param gpio: GPIO backend (see gpio_backend.py), default RPi.GPIO
+        :param wait: wait for data ready by "poll", "edge" or "sleep" (see ready_wait.py)
+        :param timeout: seconds to wait for data ready, None - wait forever
+        """
+        self.GPIO = as_backend(gpio)
+
+        # Set the pin numbers
+        self.DOUTS  = list(douts)
+        self.PD_SCK = pd_sck
+        self.N      = len(self.DOUTS)
+
+        self.OFFSETS = [0] * self.N
+        self.TABLES  = [CalibrationTable([(0,1)]) for _ in range(self.N)]
+
+        # Setup the gpio pin numbering system
+        GPIO = self.GPIO
+        GPIO.setmode(GPIO.BCM)
+
+        GPIO.setup(self.PD_SCK, GPIO.OUT)
+        for dout in self.DOUTS:
+            GPIO.setup(dout, GPIO.IN)
+
+        self.WAITERS = [ReadyWaiter(GPIO, dout, wait, timeout) for dout in self.DOUTS]
+
+        # Power up the chips
+        self.reset()
+
+
+    def set_offsets(self, offsets):
+        self.OFFSETS = list(offsets)
+
+
+    def set_ratios(self, channel, *ratios):
+        """
+        Set (measured sensor data @ reference weight, calculated ratio) pairs of one channel
+        """
+        self.TABLES[channel] = CalibrationTable(ratios)
+
+
+    def read(self):
+        """
+        Read data from all HX711 chips at once
+        :return list of sensor data, one per chip
+        """
+        # Wait until all chips are ready
+        for waiter in self.WAITERS:
+            waiter.wait()
+
+        # 25 SCKs -> next gain = 128
+        counts = self.GPIO.shift_in_many(self.DOUTS, self.PD_SCK, 25)
+        return [count ^ 0x800000 for count in counts]
+
+
+    def samples(self, times):
+        """
+        :return list of `times` samples per channel
+        """
+        return list(zip(*[self.read() for i in range(times)]))
+
+
+    def read_average(self, times=16):
+        """
+        Calculate the average value of each channel
+        :param times: read x samples to get average
+        """
+        return [sum(values) / times for values in self.samples(times)]
+
+
+    def read_average_no_spikes(self, times=25):
+        """
+        Average of each channel without the lowest and highest 20%
+        """
+        cut = times//5 # discard remainder
+        return [statistics.mean(sorted(values)[cut:-cut]) for values in self.samples(times)]
+
+
+    def to_grams(self, values):
+        """
+        :param values: sensor data, one per channel
+        :return list of weights in grams, one per channel
+        """
+        return [(value - offset) / table.ratio(value)
+                for (value, offset, table) in zip(values, self.OFFSETS, self.TABLES)]
+
+
+    def total_grams(self, values):
+        """
+        :return sum of the weights of all channels (e.g. the weight on the platform)
+        """
+        return sum(self.to_grams(values))
+
+
+    def tare(self, times=16):
+        """
+        Tare functionality for calibration
+        :param times: set value to calculate average
+        """
+        self.set_offsets(self.read_average_no_spikes(times))
+
+
+    def power_down(self):
+        """
+        Power the chips down
+        """
+        self.GPIO.output(self.PD_SCK, False)
+        self.GPIO.output(self.PD_SCK, True)
+        time.sleep(0.001)
+
+
+    def power_up(self):
+        """
+        Power the chips up
+        """
+        self.GPIO.output(self.PD_SCK, False)
+        time.sleep(0.001)
+
+
+    def reset(self):
+        self.power_down()
+        self.power_up()
@@ -0,0 +1,196 @@
+"""
+Simulated HX711 chip(s) behind the GPIO backend interface
+
+Models the serial protocol as described in the datasheet:
+https://cdn.sparkfun.com/datasheets/Sensors/ForceFlex/hx711_english.pdf
+- DOUT stays high until a conversion is ready, then goes low
+- 24 PD_SCK pulses shift the data out MSB first, the 25th pulse pulls DOUT high again
+- PD_SCK high for more than 60us powers the chip down
+
+The simulated samples are given as values returned by HX711.read(), e.g. replayed
+from the data_*.txt / calibration_data.txt files, so no real hardware is needed.
+
+Run `python hx711_sim.py` to measure the per-sample cost of HX711.read().
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import itertools
+import random
+import time
+
+from gpio_backend import GPIOBackend
+
+
+def load_counts(filename, column=1):
+    """
+    Load raw sensor data from a comma separated file (e.g., data_1_full.txt)
+    :param filename: file generated by calibration.py
+    :param column: column holding the raw sensor data
+    :return list of raw sensor data
+    """
+    with open(filename) as f:
+        return [float(line.split(',')[column]) for line in f if line.strip()]
+
+
+# PD_SCK held high at least this long always powers the chip down, also with
+# power_down_s=None: HX711.power_down() holds it high for 1 ms
+RESET_S = 0.0009
+
+
+class SimulatedHX711:
+    """ One simulated HX711 chip, driven through SimulatedGPIO """
+
+    def __init__(self, dout, pd_sck, samples, rate=None, noise=0, repeat=True, seed=None, power_down_s=60e-6, samples_b=None):
+        """
+        :param dout: Serial Data Output pin
+        :param pd_sck: Power Down and Serial Clock Input pin
+        :param samples: values to be returned by HX711.read(), in order
+        :param rate: samples per second (10 or 80 on a real chip); None - always ready
+        :param noise: standard deviation of gaussian noise added to the samples
+        :param repeat: replay the samples over and over again
+        :param seed: seed for the noise generator
+        :param power_down_s: PD_SCK high time which powers the chip down; None - only
+                             deliberate power downs (RESET_S), for slow clocking
+        :param samples_b: channel B (gain 32) values, None - channel A values scaled to gain 32
+        """
+        self.DOUT   = dout
+        self.PD_SCK = pd_sck
+
+        self.SAMPLES = itertools.cycle(samples) if repeat else iter(samples)
+        if samples_b is not None:
+            self.SAMPLES_B = itertools.cycle(samples_b) if repeat else iter(samples_b)
+        else:
+            self.SAMPLES_B = None
+        self.PERIOD  = 1.0 / rate if rate else 0
+        self.NOISE   = noise
+        self.RANDOM  = random.Random(seed)
+        self.POWER_DOWN_S = power_down_s
+        self._limit = RESET_S if power_down_s is None else min(power_down_s, RESET_S)
+
+        self.FRAMES = 0   # Number of frames clocked out
+        self.POWER_DOWNS = 0
+
+        self.power_up()
+
+
+    def power_up(self):
+        self.GAIN      = 128  # Gain of the running conversion, channel A after reset
+        self._pulse    = 0    # Rising PD_SCK edges within the current frame
+        self._word     = None # Data word being shifted out
+        self._sck      = False
+        self._sck_high = 0
+        self._ready_at = time.monotonic() + max(self.PERIOD, 0.001) # Settling after power up
+
+
+    def _next_word(self):
+        # StopIteration when the replay is over
+        if self.GAIN == 32 and self.SAMPLES_B is not None:
+            value = next(self.SAMPLES_B)
+        else:
+            value = (next(self.SAMPLES) - 0x800000) * self.GAIN / 128.0 + 0x800000
+        if self.NOISE:
+            value += self.RANDOM.gauss(0, self.NOISE)
+        value = min(max(int(round(value)), 0), 0xFFFFFF)
+        return value ^ 0x800000 # As sent by the chip, see HX711.read()
+
+
+    def _end_frame(self):
+        self.FRAMES   += 1
+        self.GAIN      = {25: 128, 26: 32, 27: 64}.get(self._pulse, 128)
+        self._pulse    = 0
+        self._word     = None
+        self._ready_at = max(self._ready_at + self.PERIOD, time.monotonic()) if self.PERIOD else 0
+
+
+    def is_ready(self):
+        if self._pulse >= 25:
+            self._end_frame()
+        return self._pulse == 0 and time.monotonic() >= self._ready_at
+
+
+    def dout(self):
+        """
+        Level of the DOUT pin
+        """
+        if self._pulse == 0 or self._pulse >= 25:
+            return 0 if self.is_ready() else 1
+        if self._word is None:
+            self._word = self._next_word()
+        return (self._word >> (24 - self._pulse)) & 1
+
+
+    def sck(self, value):
+        """
+        Drive the PD_SCK pin
+        """
+        value = bool(value)
+        if value == self._sck:
+            return
+        self._sck = value
+
+        if value: # Rising edge
+            self._sck_high = time.monotonic()
+            if self._pulse == 0 and not self.is_ready():
+                return
+            if self._pulse < 27:
+                self._pulse += 1
+        else: # Falling edge
+            # A power down pulse never clocks data: the pulse counted on the rising edge is dropped
+            if time.monotonic() - self._sck_high > self._limit:
+                self.POWER_DOWNS += 1
+                self.power_up() # PD_SCK went low again, chip back in normal mode
+
+
+class SimulatedGPIO(GPIOBackend):
+    """ GPIO backend connected to simulated HX711 chips """
+
+    def __init__(self, *chips):
+        self.CHIPS = chips
+        self._dout   = dict((chip.DOUT, chip) for chip in chips)
+        self._pd_sck = {}
+        for chip in chips:
+            self._pd_sck.setdefault(chip.PD_SCK, []).append(chip)
+
+        self.MODE = None
+        self.PINS = {}
+
+
+    def setmode(self, mode):
+        self.MODE = mode
+
+
+    def setup(self, pin, mode, pull_up_down=None):
+        self.PINS[pin] = mode
+
+
+    def output(self, pin, value):
+        for chip in self._pd_sck.get(pin, ()):
+            chip.sck(value)
+
+
+    def input(self, pin):
+        return self._dout[pin].dout()
+
+
+    def cleanup(self):
+        self.PINS = {}
+
+
+##################################
+
+if __name__ == "__main__":
+    from hx711 import HX711
+
+    times  = 2000
+    counts = load_counts("calibration_data.txt")
+    hx = HX711(dout=5, pd_sck=6, gpio=SimulatedGPIO(SimulatedHX711(5, 6, counts, noise=50)))
+
+    start = time.perf_counter()
+    for i in range(times):
+        hx.read()
+    elapsed = time.perf_counter() - start
+
+    print( "HX711.read(): %.1f us/sample, %d samples" % (elapsed / times * 1e6, times) )
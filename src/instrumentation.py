@@ -0,0 +1,195 @@
+"""
+Instrumentation of the HX711 read path
+
+Per frame: time waiting for data ready, time clocking the data out, the longest
+PD_SCK high pulse (above 60us the chip powers down and the frame is corrupt),
+suspected corrupt frames (saturated or stuck readings, which may also be valid
+ones) and the effective sample rate. Enabled per object with hx.enable_stats();
+when disabled the read path only checks `self.STATS is None`.
+
+    hx.enable_stats()
+    ...
+    print( hx.STATS.snapshot() )
+    print( hx.STATS.prometheus() ) # Prometheus text exposition format
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import bisect
+import time
+
+POWER_DOWN_S = 60e-6 # PD_SCK high longer than this powers the chip down
+
+# Histogram bucket upper bounds [s]
+WAIT_BUCKETS  = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CLOCK_BUCKETS = (0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01)
+HIGH_BUCKETS  = (0.000001, 0.000005, 0.00001, 0.00003, 0.00006, 0.0001, 0.001)
+
+
+class Histogram:
+
+    def __init__(self, bounds):
+        self.BOUNDS = bounds
+        self.COUNTS = [0] * (len(bounds) + 1) # Last one: +Inf
+        self.SUM    = 0.0
+        self.N      = 0
+
+
+    def observe(self, value):
+        self.COUNTS[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.SUM += value
+        self.N   += 1
+
+
+    def cumulative(self):
+        """
+        [(upper bound, number of values <= bound)], the last bound is +Inf
+        """
+        result = []
+        total  = 0
+        for bound, n in zip(self.BOUNDS + (float("inf"),), self.COUNTS):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class ReadStats:
+
+    def __init__(self, labels=None):
+        """
+        :param labels: Prometheus labels, e.g. {"dout": 5}
+        """
+        self.LABELS = dict(labels or {})
+
+        self.READS    = 0
+        self.TIMEOUTS = 0
+        self.CORRUPT  = 0 # Suspected corrupt frames
+        self._stuck   = 0 # Consecutive all ones frames
+        self.MAX_HIGH = 0.0
+
+        self.WAIT  = Histogram(WAIT_BUCKETS)
+        self.CLOCK = Histogram(CLOCK_BUCKETS)
+        self.HIGH  = Histogram(HIGH_BUCKETS) # Longest high pulse per frame
+
+        self.FIRST = None # Time of the first and the last frame
+        self.LAST  = None
+
+
+    def observe(self, wait_s, clock_s, high_s, raw):
+        """
+        Record a frame
+        :param raw: 24 bit data word as sent by the chip
+        """
+        now = time.monotonic()
+        if self.FIRST is None:
+            self.FIRST = now
+        self.LAST   = now
+        self.READS += 1
+
+        self.WAIT.observe(wait_s)
+        self.CLOCK.observe(clock_s)
+        self.HIGH.observe(high_s)
+        self.MAX_HIGH = max(self.MAX_HIGH, high_s)
+
+        # All ones is also a valid reading (-1): only DOUT stuck high on consecutive frames counts
+        if raw == 0xFFFFFF:
+            self._stuck += 1
+            stuck = self._stuck >= 2
+            if self._stuck == 2:
+                self.CORRUPT += 1 # The first frame of the run
+        else:
+            self._stuck = 0
+            stuck = False
+
+        # Chip powered down mid-frame, DOUT stuck high, or saturated input
+        if high_s > POWER_DOWN_S or stuck or raw in (0x7FFFFF, 0x800000):
+            self.CORRUPT += 1
+
+
+    def rate(self):
+        """
+        Effective samples per second
+        """
+        if self.READS < 2 or self.LAST == self.FIRST:
+            return 0.0
+        return (self.READS - 1) / (self.LAST - self.FIRST)
+
+
+    def snapshot(self):
+        return {
+            "reads"                    : self.READS,
+            "timeouts"                 : self.TIMEOUTS,
+            "suspected_corrupt_frames" : self.CORRUPT,
+            "samples_per_s"            : self.rate(),
+            "max_high_pulse_s"         : self.MAX_HIGH,
+            "ready_wait_s"             : {"sum": self.WAIT.SUM,  "buckets": self.WAIT.cumulative()},
+            "clocking_s"               : {"sum": self.CLOCK.SUM, "buckets": self.CLOCK.cumulative()},
+            "high_pulse_s"             : {"sum": self.HIGH.SUM,  "buckets": self.HIGH.cumulative()},
+        }
+
+
+    def prometheus(self, prefix="hx711"):
+        return prometheus_text([self], prefix)
+
+
+def timed_read(stats, gpio, waiter, dout, pd_sck, pulses):
+    """
+    Instrumented wait for data ready and shift_in() of HX711/HX711_2 read()
+    :return 24 bit data word as sent by the chip
+    """
+    clock = time.perf_counter
+    start = clock()
+    try:
+        waiter.wait()
+    except TimeoutError:
+        stats.TIMEOUTS += 1
+        raise
+    ready = clock()
+    count, high = gpio.shift_in_timed(dout, pd_sck, pulses)
+    stats.observe(ready - start, clock() - ready, high, count)
+    return count
+
+
+def _labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, v) for k, v in items) + "}"
+
+
+def prometheus_text(stats, prefix="hx711"):
+    """
+    Prometheus text exposition format of several ReadStats (e.g. both chips of HX711_2)
+    """
+    lines = []
+
+    def metric(name, kind, help, values):
+        lines.append("# HELP %s_%s %s" % (prefix, name, help))
+        lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+        for s in stats:
+            lines.append("%s_%s%s %s" % (prefix, name, _labels(s.LABELS), repr(values(s))))
+
+    def histogram(name, help, get):
+        lines.append("# HELP %s_%s %s" % (prefix, name, help))
+        lines.append("# TYPE %s_%s histogram" % (prefix, name))
+        for s in stats:
+            h = get(s)
+            for bound, n in h.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("%s_%s_bucket%s %d" % (prefix, name, _labels(s.LABELS, le=le), n))
+            lines.append("%s_%s_sum%s %s" % (prefix, name, _labels(s.LABELS), repr(h.SUM)))
+            lines.append("%s_%s_count%s %d" % (prefix, name, _labels(s.LABELS), h.N))
+
+    metric("reads_total", "counter", "Frames read", lambda s: s.READS)
+    metric("timeouts_total", "counter", "Data ready timeouts", lambda s: s.TIMEOUTS)
+    metric("suspected_corrupt_frames_total", "counter",
+           "Suspected corrupt frames: PD_SCK high > 60us, DOUT stuck high or saturated input", lambda s: s.CORRUPT)
+    metric("samples_per_second", "gauge", "Effective sample rate", lambda s: s.rate())
+    metric("max_high_pulse_seconds", "gauge", "Longest PD_SCK high pulse", lambda s: s.MAX_HIGH)
+    histogram("ready_wait_seconds", "Time waiting for data ready", lambda s: s.WAIT)
+    histogram("clocking_seconds", "Time clocking a frame out", lambda s: s.CLOCK)
+    histogram("high_pulse_seconds", "Longest PD_SCK high pulse per frame", lambda s: s.HIGH)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,160 @@
+"""
+Waiting for the HX711 data to be ready (DOUT going low)
+
+Modes:
+- "poll":  busy-wait on DOUT, lowest latency, burns a full CPU core while waiting
+- "edge":  block on a falling edge of DOUT (GPIO.wait_for_edge), almost no CPU while waiting
+- "sleep": sleep until shortly before the next conversion is expected, based on the
+           measured conversion period, then poll DOUT for the remaining time
+
+wait_async() is the asyncio counterpart, used by HX711.read_async().
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import asyncio
+import math
+import time
+
+
+class ReadyWaiter:
+
+    MODES = ("poll", "edge", "sleep")
+
+    def __init__(self, gpio, dout, mode="poll", timeout=None, rate=None):
+        """
+        :param gpio: GPIO backend
+        :param dout: Serial Data Output pin
+        :param mode: "poll", "edge" or "sleep"
+        :param timeout: seconds to wait for the chip, None - wait forever
+        :param rate: nominal samples per second (10 or 80), None - measure it
+        """
+        if mode not in self.MODES:
+            raise ValueError("Unknown ready-wait mode: %s" % mode)
+
+        self.GPIO    = gpio
+        self.DOUT    = dout
+        self.MODE    = mode
+        self.TIMEOUT = timeout
+
+        self.PERIOD  = 1.0 / rate if rate else None # Conversion period [s]
+        self.LAST    = None # Time the chip was last seen ready
+        self.MEASURE = rate is None
+
+        self._wait = {"poll": self._wait_poll, "edge": self._wait_edge, "sleep": self._wait_sleep}[mode]
+
+
+    def wait(self):
+        """
+        Wait until the chip is ready
+        :raise TimeoutError: if the chip is not ready within TIMEOUT seconds
+        """
+        deadline = None if self.TIMEOUT is None else time.monotonic() + self.TIMEOUT
+        if not self._wait(deadline):
+            raise TimeoutError("HX711 (DOUT pin %s) not ready within %s s" % (self.DOUT, self.TIMEOUT))
+
+
+    async def wait_async(self):
+        """
+        wait() for asyncio: poll DOUT between asyncio.sleep()s, sleeping until shortly
+        before the next conversion is expected once the conversion period is known
+        :raise TimeoutError: if the chip is not ready within TIMEOUT seconds
+        """
+        deadline = None if self.TIMEOUT is None else time.monotonic() + self.TIMEOUT
+        input    = self.GPIO.input
+        if input(self.DOUT) == 0:
+            return # Ready before the call, LAST and PERIOD are kept
+
+        wakeup = None
+        if self.PERIOD is not None and self.LAST is not None:
+            margin = max(self.PERIOD * 0.1, 0.0005)
+            now    = time.monotonic()
+            wakeup = self.LAST + math.ceil((now + margin - self.LAST) / self.PERIOD) * self.PERIOD - margin
+
+        polled = False # DOUT seen high within the last poll interval
+        while input(self.DOUT) == 1:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise TimeoutError("HX711 (DOUT pin %s) not ready within %s s" % (self.DOUT, self.TIMEOUT))
+
+            delay = 0.0005
+            if wakeup is not None and wakeup - now > delay:
+                delay = wakeup - now
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+            polled = delay <= 0.0005
+            await asyncio.sleep(delay)
+
+        if polled:
+            self._update_period(time.monotonic())
+
+
+    def _update_period(self, now):
+        """
+        The conversion period is the shortest interval between two ready chips,
+        longer intervals are multiples of it (samples not read in time).
+        Only called when DOUT was seen going low: if it was low already, the time
+        the conversion got ready is unknown
+        """
+        if self.MEASURE and self.LAST is not None:
+            interval = now - self.LAST
+            if interval > 0.001 and (self.PERIOD is None or interval < self.PERIOD):
+                self.PERIOD = interval
+        self.LAST = now
+
+
+    def _wait_poll(self, deadline):
+        input = self.GPIO.input
+        DOUT  = self.DOUT
+
+        if deadline is None:
+            while input(DOUT) == 1:
+                pass
+            return True
+
+        while input(DOUT) == 1:
+            if time.monotonic() >= deadline:
+                return False
+        return True
+
+
+    def _wait_edge(self, deadline):
+        GPIO = self.GPIO
+
+        # DOUT stays low until the data is read, an edge missed before
+        # wait_for_edge() is called is caught by the level check in the next slice
+        while GPIO.input(self.DOUT) == 1:
+            chunk = 100 if self.PERIOD is None else self.PERIOD * 2000 # [ms]
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                chunk = min(chunk, remaining * 1000)
+            GPIO.wait_for_edge(self.DOUT, GPIO.FALLING, timeout=max(int(chunk), 1))
+        return True
+
+
+    def _wait_sleep(self, deadline):
+        input = self.GPIO.input
+        if input(self.DOUT) == 0:
+            return True # Ready before the call, LAST and PERIOD are kept
+
+        if self.PERIOD is not None and self.LAST is not None:
+            # Conversions run continuously, wake up a bit before the next one is expected
+            margin = max(self.PERIOD * 0.1, 0.0005)
+            now    = time.monotonic()
+            wakeup = self.LAST + math.ceil((now + margin - self.LAST) / self.PERIOD) * self.PERIOD - margin
+            if deadline is not None:
+                wakeup = min(wakeup, deadline)
+            delay = wakeup - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if input(self.DOUT) == 0:
+                return True # Got ready while sleeping, too late to time it
+
+        if not self._wait_poll(deadline):
+            return False
+        self._update_period(time.monotonic())
+        return True
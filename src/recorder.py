@@ -0,0 +1,162 @@
+"""
+Compact binary recording and replay of raw sensor data streams
+
+File format (little endian):
+    header  - 32 bytes: magic "HX711REC", version (uint16), channels (uint16),
+              reserved (uint32), number of records (uint64), reserved (uint64)
+    records - timestamp in ns (int64), raw sensor data (int32) per channel
+
+The file is preallocated and memory mapped; it grows by doubling when full.
+Record while reading:
+
+    recorder = Recorder("run.hx711", channels=1)
+    hx.add_listener(recorder)      # HX711; HX711_2: channels=2
+    ...
+    recorder.close()
+
+Replay offline, faster than real time:
+
+    replay = Replay("run.hx711")
+    grams  = hx.to_grams_array(replay.counts())        # zero-copy NumPy view
+    hx     = HX711(5, 6, gpio=SimulatedGPIO(replay.chip(5, 6)))
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import mmap
+import struct
+import time
+
+from calibration_table import numpy
+from hx711_sim import SimulatedHX711
+
+MAGIC   = b"HX711REC"
+VERSION = 1
+HEADER  = struct.Struct("<8sHHIQQ")
+COUNT_OFFSET = 16 # Offset of the number of records in the header
+
+
+def _record_struct(channels):
+    return struct.Struct("<q" + "i" * channels)
+
+
+class Recorder:
+
+    def __init__(self, filename, channels=1, capacity=65536):
+        """
+        :param filename: file to be written, overwritten if it exists
+        :param channels: number of raw sensor data values per record
+        :param capacity: number of records preallocated
+        """
+        self.FILENAME = filename
+        self.CHANNELS = channels
+        self.RECORD   = _record_struct(channels)
+        self.N        = 0
+
+        self._file = open(filename, "w+b")
+        self._file.write(HEADER.pack(MAGIC, VERSION, channels, 0, 0, 0))
+        self._map(capacity)
+
+
+    def _map(self, capacity):
+        self.CAPACITY = capacity
+        self._file.truncate(HEADER.size + capacity * self.RECORD.size)
+        self.MMAP = mmap.mmap(self._file.fileno(), 0)
+
+
+    def append(self, timestamp_ns, *counts):
+        """
+        Add a record
+        :param timestamp_ns: e.g. time.time_ns()
+        :param counts: raw sensor data, one per channel
+        """
+        if self.N == self.CAPACITY:
+            self.MMAP.close()
+            self._map(self.CAPACITY * 2)
+
+        self.RECORD.pack_into(self.MMAP, HEADER.size + self.N * self.RECORD.size, timestamp_ns, *counts)
+        self.N += 1
+        struct.pack_into("<Q", self.MMAP, COUNT_OFFSET, self.N) # The file is valid after each record
+
+
+    def __call__(self, *counts):
+        """
+        HX711/HX711_2 listener
+        """
+        self.append(time.time_ns(), *counts)
+
+
+    def close(self):
+        """
+        Flush the records and cut off the unused preallocated space
+        """
+        self.MMAP.flush()
+        self.MMAP.close()
+        self._file.truncate(HEADER.size + self.N * self.RECORD.size)
+        self._file.close()
+
+
+class Replay:
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.MMAP = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, channels, _, n, _ = HEADER.unpack_from(self.MMAP, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a HX711 recording" % filename)
+
+        self.CHANNELS = channels
+        self.RECORD   = _record_struct(channels)
+        self.N        = n
+
+
+    def __len__(self):
+        return self.N
+
+
+    def __iter__(self):
+        """
+        (timestamp in ns, raw sensor data, ...) records, no NumPy needed
+        """
+        end = HEADER.size + self.N * self.RECORD.size
+        return self.RECORD.iter_unpack(memoryview(self.MMAP)[HEADER.size:end])
+
+
+    def records(self):
+        """
+        NumPy structured array of the records, a view on the file (no copy)
+        """
+        if numpy is None:
+            raise ImportError("numpy is needed for the NumPy views")
+        dtype = numpy.dtype([("t_ns", "<i8"), ("count", "<i4", (self.CHANNELS,))])
+        return numpy.frombuffer(self.MMAP, dtype=dtype, count=self.N, offset=HEADER.size)
+
+
+    def counts(self, channel=0):
+        """
+        Raw sensor data of one channel (NumPy view, no copy)
+        """
+        return self.records()["count"][:, channel]
+
+
+    def timestamps(self):
+        """
+        Timestamps in ns (NumPy view, no copy)
+        """
+        return self.records()["t_ns"]
+
+
+    def chip(self, dout, pd_sck, channel=0, **kwargs):
+        """
+        Simulated HX711 replaying one channel as fast as it is read,
+        so all HX711 read methods can be used on the recording
+        """
+        samples = [record[1 + channel] for record in self]
+        return SimulatedHX711(dout, pd_sck, samples, repeat=False, **kwargs)
+
+
+    def close(self):
+        self.MMAP.close()
@@ -0,0 +1,102 @@
+"""
+Fixed-size ring buffer of timestamped raw HX711 samples
+
+Written by the acquisition thread (see HX711.start_acquisition()), read by
+any number of consumers. The samples are kept in `array` objects, so no
+Python object is allocated per buffered sample.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import threading
+from array import array
+
+
+class RingBuffer:
+
+    def __init__(self, size=256):
+        """
+        :param size: number of samples kept
+        """
+        self.SIZE   = size
+        self.COUNTS = array('l', [0]) * size   # raw sensor data
+        self.TIMES  = array('d', [0.0]) * size # time.monotonic() of the samples
+        self.INDEX  = 0 # Number of samples written so far
+        self.ERROR  = None
+
+        self._cond = threading.Condition()
+
+
+    def __len__(self):
+        return min(self.INDEX, self.SIZE)
+
+
+    def append(self, count, timestamp):
+        with self._cond:
+            i = self.INDEX % self.SIZE
+            self.COUNTS[i] = count
+            self.TIMES[i]  = timestamp
+            self.INDEX += 1
+            self._cond.notify_all()
+
+
+    def close(self, error=None):
+        """
+        No more samples will be written, wake up the waiting consumers
+        :param error: exception which stopped the acquisition
+        """
+        with self._cond:
+            self.ERROR = error if error is not None else RuntimeError("Acquisition stopped")
+            self._cond.notify_all()
+
+
+    def _wait_for(self, index, timeout):
+        """
+        Wait until the buffer holds `index` samples, lock held by the caller
+        """
+        if not self._cond.wait_for(lambda: self.INDEX >= index or self.ERROR is not None, timeout):
+            raise TimeoutError("No sample within %s s" % timeout)
+        if self.INDEX < index:
+            raise self.ERROR
+
+
+    def _slice(self, n):
+        """
+        Latest n samples in chronological order, lock held by the caller
+        """
+        end   = self.INDEX % self.SIZE
+        start = (self.INDEX - n) % self.SIZE
+        if start < end or n == 0:
+            return self.COUNTS[start:end], self.TIMES[start:end]
+        return self.COUNTS[start:] + self.COUNTS[:end], self.TIMES[start:] + self.TIMES[:end]
+
+
+    def latest(self, n, timeout=None):
+        """
+        Latest n raw samples, oldest first; waits until n samples were acquired
+        :param n: number of samples, at most SIZE
+        :param timeout: seconds to wait, None - wait forever
+        """
+        return self.latest_timed(n, timeout)[0]
+
+
+    def latest_timed(self, n, timeout=None):
+        """
+        Same as latest(), returns (raw samples, timestamps)
+        """
+        if n > self.SIZE:
+            raise ValueError("Only %d samples are buffered" % self.SIZE)
+        with self._cond:
+            self._wait_for(n, timeout)
+            return self._slice(n)
+
+
+    def next(self, timeout=None):
+        """
+        Wait for the next sample to be acquired and return it
+        """
+        with self._cond:
+            self._wait_for(self.INDEX + 1, timeout)
+            return self.COUNTS[(self.INDEX - 1) % self.SIZE]
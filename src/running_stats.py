@@ -0,0 +1,73 @@
+"""
+Running mean and variance of streaming sensor data (Welford's algorithm)
+
+Used by HX711.read_precise() to stop averaging as soon as the mean is known
+precisely enough.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import math
+import statistics
+
+
+# Exact two-sided t quantiles for df = 1..5, where the expansion below is too low
+T_TABLE = {
+    0.90: (6.314, 2.920, 2.353, 2.132, 2.015),
+    0.95: (12.706, 4.303, 3.182, 2.776, 2.571),
+    0.99: (63.657, 9.925, 5.841, 4.604, 4.032),
+}
+
+
+def t_quantile(confidence, n):
+    """
+    Two-sided Student t quantile: T_TABLE for few samples, else the Cornish-Fisher
+    expansion of the normal quantile (within 2% for n >= 7 up to 0.99, no SciPy needed)
+    :param confidence: e.g. 0.95
+    :param n: number of samples
+    """
+    df = n - 1
+    if df < 1:
+        return float("inf")
+    table = T_TABLE.get(confidence)
+    if table is not None and df <= len(table):
+        return table[df - 1]
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    return z + (z**3 + z) / (4 * df) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+
+
+class RunningStats:
+
+    def __init__(self):
+        self.N    = 0
+        self.MEAN = 0.0
+        self._m2  = 0.0 # Sum of squared differences from the mean
+
+
+    def add(self, value):
+        self.N += 1
+        delta = value - self.MEAN
+        self.MEAN += delta / self.N
+        self._m2  += delta * (value - self.MEAN)
+
+
+    def variance(self):
+        """
+        Sample variance
+        """
+        return self._m2 / (self.N - 1) if self.N > 1 else float("inf")
+
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+
+    def margin(self, confidence=0.95):
+        """
+        Half width of the confidence interval of the mean
+        """
+        if self.N < 2:
+            return float("inf")
+        return t_quantile(confidence, self.N) * math.sqrt(self.variance() / self.N)
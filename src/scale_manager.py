@@ -0,0 +1,139 @@
+"""
+Run many independent scales (one HX711 each) in parallel on one host
+
+Each scale is read by its own worker thread or process, optionally pinned to
+a set of CPUs, and all results are collected in one queue as
+(scale id, timestamp, value) tuples.
+
+    manager = ScaleManager(mode="process")
+    manager.add("scale_1", functools.partial(HX711, dout=5, pd_sck=6, wait="edge"), cpus={1})
+    manager.add("scale_2", functools.partial(HX711, dout=20, pd_sck=21, wait="edge"), cpus={2})
+    manager.start()
+    for scale_id, timestamp, value in manager.results():
+        ...
+
+Note: In "thread" mode the workers share the interpreter, so create the HX711
+objects with wait="edge" or wait="sleep", the busy-wait would starve the other
+scales. "process" mode scales with the number of cores.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+
+def _worker(scale_id, factory, method, args, cpus, results, stop):
+    """
+    Read one scale until stopped; an exception ends the worker and is put in the results
+    """
+    try:
+        if cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus) # The calling thread/process only (Linux)
+
+        hx   = factory() # Created in the worker, GPIO state is not shared between processes
+        read = getattr(hx, method)
+
+        while not stop.is_set():
+            try:
+                value = read(*args)
+            except TimeoutError:
+                continue
+            results.put((scale_id, time.time(), value))
+
+    except Exception as e:
+        results.put((scale_id, time.time(), e))
+
+
+class ScaleManager:
+
+    MODES = ("thread", "process")
+
+    def __init__(self, mode="thread", queue_size=0):
+        """
+        :param mode: run the scales in "thread"s or "process"es
+        :param queue_size: maximum number of queued results (0 - unlimited);
+                           the workers block when the queue is full
+        """
+        if mode not in self.MODES:
+            raise ValueError("Unknown mode: %s" % mode)
+
+        self.MODE    = mode
+        self.SCALES  = {} # scale id -> (factory, method, args, cpus)
+        self.WORKERS = {} # scale id -> Thread/Process
+
+        if mode == "thread":
+            self.RESULTS = queue.Queue(queue_size)
+            self.STOP    = threading.Event()
+        else:
+            self.RESULTS = multiprocessing.Queue(queue_size)
+            self.STOP    = multiprocessing.Event()
+
+
+    def add(self, scale_id, factory, method="read", args=(), cpus=None):
+        """
+        Add a scale
+        :param scale_id: key of the scale in the results
+        :param factory: callable returning the HX711 object, e.g. functools.partial(HX711, dout=5, pd_sck=6)
+        :param method: HX711 method called for each result, e.g. "read", "read_average", "read_estimates"
+        :param args: arguments of the method
+        :param cpus: set of CPUs the worker runs on, None - no affinity
+        """
+        if scale_id in self.SCALES:
+            raise ValueError("Scale %s already added" % scale_id)
+        self.SCALES[scale_id] = (factory, method, tuple(args), cpus)
+
+
+    def start(self):
+        """
+        Start a worker per scale
+        """
+        self.STOP.clear()
+        for scale_id, (factory, method, args, cpus) in self.SCALES.items():
+            if scale_id in self.WORKERS:
+                continue
+            params = (scale_id, factory, method, args, cpus, self.RESULTS, self.STOP)
+            if self.MODE == "thread":
+                worker = threading.Thread(target=_worker, args=params, name="scale-%s" % scale_id)
+            else:
+                worker = multiprocessing.Process(target=_worker, args=params, name="scale-%s" % scale_id)
+            worker.daemon = True
+            worker.start()
+            self.WORKERS[scale_id] = worker
+
+
+    def stop(self, timeout=1.0):
+        """
+        Stop the workers
+        :param timeout: seconds to wait for each worker
+        """
+        self.STOP.set()
+        for worker in self.WORKERS.values():
+            worker.join(timeout)
+            if self.MODE == "process" and worker.is_alive():
+                worker.terminate() # e.g. blocked in read() without timeout
+        self.WORKERS = {}
+
+
+    def get(self, timeout=None):
+        """
+        Next result (scale id, timestamp, value); value is the exception if a worker failed
+        :raise queue.Empty: no result within timeout seconds
+        """
+        return self.RESULTS.get(timeout=timeout)
+
+
+    def results(self, timeout=None):
+        """
+        Iterate over the results of all scales, until no result within timeout seconds
+        """
+        while True:
+            try:
+                yield self.get(timeout)
+            except queue.Empty:
+                return
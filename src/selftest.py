@@ -0,0 +1,146 @@
+"""
+Self-test of the parts which can be checked without the hardware
+
+    python selftest.py
+
+Runs every check_*() function of this file and raises RuntimeError on the
+first failure.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import os
+import tempfile
+
+
+def expect(condition, message):
+    if not condition:
+        raise RuntimeError(message)
+
+
+def check_mmap_gpio():
+    """
+    MMapGPIO on a file-backed register page instead of /dev/gpiomem
+    """
+    from gpio_mmap import MMapGPIO
+
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, b"\0" * 4096)
+        os.close(fd)
+        gpio = MMapGPIO(path)
+        regs = gpio.REGS
+
+        # Function select: pin 6 output, pin 5 input, the other pins of the register kept
+        regs[MMapGPIO.GPFSEL0] = 7 << 3*7
+        gpio.setup(6, gpio.OUT)
+        gpio.setup(5, gpio.IN)
+        expect(regs[MMapGPIO.GPFSEL0] == (7 << 3*7) | (1 << 3*6), "GPFSEL0: %#x" % regs[MMapGPIO.GPFSEL0])
+
+        # Set/clear registers, one bit per pin; pins >= 32 in the next register
+        gpio.output(6, True)
+        expect(regs[MMapGPIO.GPSET0] == 1 << 6, "GPSET0: %#x" % regs[MMapGPIO.GPSET0])
+        gpio.output(6, False)
+        expect(regs[MMapGPIO.GPCLR0] == 1 << 6, "GPCLR0: %#x" % regs[MMapGPIO.GPCLR0])
+        gpio.output(40, True)
+        expect(regs[MMapGPIO.GPSET0 + 1] == 1 << 8, "GPSET1: %#x" % regs[MMapGPIO.GPSET0 + 1])
+
+        # Level register: DOUT 5 high, DOUT 20 low
+        regs[MMapGPIO.GPLEV0] = 1 << 5
+        expect(gpio.input(5) == 1 and gpio.input(20) == 0, "input()")
+        expect(gpio.shift_in(5, 6) == 0xFFFFFF, "shift_in() of a high DOUT")
+        expect(gpio.shift_in(20, 6, 27) == 0, "shift_in() of a low DOUT")
+        expect(gpio.shift_in_timed(5, 6)[0] == 0xFFFFFF, "shift_in_timed() of a high DOUT")
+        expect(gpio.shift_in_many([5, 20], 6) == [0xFFFFFF, 0], "shift_in_many()")
+        expect(regs[MMapGPIO.GPCLR0] == 1 << 6, "PD_SCK left high")
+
+        # HX711 read through the page: DOUT low is ready, all zero bits
+        from hx711 import HX711
+        regs[MMapGPIO.GPLEV0] = 0
+        hx = HX711(5, 6, gpio=gpio)
+        expect(hx.read() == 0x800000, "HX711.read()")
+        hx.enable_stats()
+        expect(hx.read() == 0x800000 and hx.STATS.READS == 1, "HX711.read() with stats")
+        gpio.cleanup()
+    finally:
+        os.remove(path)
+
+
+def check_server():
+    """
+    Server on loopback with a simulated sensor, one TCP client subscribed to every 2nd sample
+    """
+    import asyncio
+    import socket
+    from hx711     import HX711
+    from hx711_sim import SimulatedGPIO, SimulatedHX711
+    from server    import Server, subscribe
+
+    counts = [8629365, 8795677, 9043736]
+    hx = HX711(5, 6, gpio=SimulatedGPIO(SimulatedHX711(5, 6, counts, rate=400)))
+    hx.set_offset(8629365)
+    hx.set_ratios((8629365, 1663.128))
+
+    with socket.socket() as sock: # Free port
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def run():
+        server = Server(hx, host="127.0.0.1", port=port)
+        task   = asyncio.ensure_future(server.run())
+        await asyncio.sleep(0.1) # Listening
+
+        messages = []
+        stream   = subscribe("127.0.0.1", port, decimate=2)
+        async for message in stream:
+            messages.append(message)
+            if len(messages) == 20:
+                break
+        await stream.aclose()
+        server.stop()
+        await asyncio.wait_for(task, 5)
+        return messages
+
+    messages = asyncio.run(run())
+    seqs = [m[0] for m in messages[-10:]] # The subscription takes effect after a few samples
+    expect(all(b - a == 2 for a, b in zip(seqs, seqs[1:])), "decimation: %s" % seqs)
+    for seq, t_ns, value, value_2, grams in messages:
+        expect(value in counts, "raw data %d" % value)
+        expect(abs(grams - (value - 8629365) / 1663.128) < 1e-6, "grams %f of %d" % (grams, value))
+
+
+def check_sliding_window():
+    """
+    SlidingWindow against sorting the window for every sample
+    """
+    import random
+    import statistics
+    from sliding_window import SlidingWindow
+
+    rnd = random.Random(1)
+    for size, trim in [(1, 0.2), (5, 0.0), (5, 0.2), (25, 0.2), (100, 0.1), (100, 0.45)]:
+        window = SlidingWindow(size, trim)
+        values = []
+        for i in range(1000):
+            # Noise, spikes and repeated values
+            value = rnd.choice((8629364.0, rnd.gauss(8629364, 300), rnd.gauss(8629364, 300) + 50000))
+            window.add(value)
+            values.append(value)
+            latest = sorted(values[-size:])
+            cut    = int(len(latest) * trim)
+            mean   = statistics.mean(latest[cut:len(latest)-cut])
+            expect(abs(window.trimmed_mean() - mean) < 1e-6,
+                   "trimmed mean, size %d trim %s sample %d: %f != %f" % (size, trim, i, window.trimmed_mean(), mean))
+            expect(window.median() == statistics.median(latest), "median, size %d sample %d" % (size, i))
+
+
+##################################
+
+if __name__ == "__main__":
+    checks = [(name, f) for name, f in sorted(globals().items()) if name.startswith("check_")]
+    for name, f in checks:
+        f()
+        print( "%-32s ok" % name )
+    print( "%d checks passed" % len(checks) )
@@ -0,0 +1,305 @@
+"""
+Network server: one acquisition loop, many clients
+
+One thread reads the HX711 (or HX711_2) at the full sample rate, applies the
+optional filter pipeline (see filters.py) and fans each sample out to
+- UDP multicast, one datagram per sample
+- TCP clients, each subscribed to a decimation factor (every n-th sample)
+
+Messages are fixed size, network byte order (MESSAGE, 28 bytes):
+    sequence number (uint32), timestamp in ns (int64),
+    raw sensor data (int32), sensor 2 raw data (int32, HX711_2 only), grams (double)
+
+A TCP client may send a SUBSCRIBE message (uint16 decimation factor) at any
+time. Each client has a bounded queue; a slow client loses its oldest queued
+samples (counted in DROPPED, visible as gaps in the sequence numbers)
+instead of delaying the acquisition or the other clients.
+
+    python server.py --sim data_1_full.txt --multicast 239.0.0.71:7712   # simulated sensor
+    python server.py --dout 5 --pd-sck 6 --offset 8629364 --ratio 1663.1
+    python server.py --dout 5 --pd-sck 6 --dout-2 20 --pd-sck-2 21 --ratio 1663.1   # HX711_2
+    python server.py --client 127.0.0.1:7711 --decimate 8
+    python server.py --listen 239.0.0.71:7712
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+
+from filters import Pipeline
+
+MESSAGE   = struct.Struct("!Iqiid")
+SUBSCRIBE = struct.Struct("!H")
+
+
+class Client:
+    """ A connected TCP client """
+
+    def __init__(self, writer, queue_size):
+        self.WRITER   = writer
+        self.QUEUE    = asyncio.Queue(queue_size)
+        self.DECIMATE = 1
+        self.DROPPED  = 0
+        self.TASK     = None # Task serving the client
+
+
+    def offer(self, seq, message):
+        if seq % self.DECIMATE:
+            return
+        self.put(message)
+
+
+    def put(self, message):
+        if self.QUEUE.full(): # Slow client: drop the oldest sample
+            self.QUEUE.get_nowait()
+            self.DROPPED += 1
+        self.QUEUE.put_nowait(message)
+
+
+class Server:
+
+    def __init__(self, hx, *stages, host="0.0.0.0", port=7711, multicast=None, ttl=1, queue_size=256):
+        """
+        :param hx: HX711 or HX711_2 object, only read by the server
+        :param stages: filter stages applied to the raw sensor data before the conversion to grams
+        :param host: TCP address, None - no TCP server
+        :param port: TCP port
+        :param multicast: (group, port) for UDP multicast, None - no multicast
+        :param ttl: multicast time-to-live, 1 - local network only
+        :param queue_size: messages queued per TCP client
+        """
+        self.HX     = hx
+        self.PAIR   = hasattr(hx, "read_both") # HX711_2: sensor 2 is the offset reference
+        self.FILTER = Pipeline(*stages) if stages else None
+        self.HOST   = host
+        self.PORT   = port
+        self.MULTICAST  = multicast
+        self.QUEUE_SIZE = queue_size
+
+        self.CLIENTS = set()
+        self.SEQ     = 0
+        self.GRAMS   = 0.0
+
+        self.SOCKET = None
+        if multicast is not None:
+            self.SOCKET = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            self.SOCKET.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.SOCKET.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+
+        self._running = False
+        self._thread  = None
+
+
+    def _sample(self):
+        """
+        :return (sensor data, sensor 2 data)
+        """
+        if self.PAIR:
+            return self.HX.read_both()
+        return self.HX.read(), 0
+
+
+    def _acquire(self, loop):
+        while self._running:
+            try:
+                value, value_2 = self._sample()
+            except TimeoutError:
+                continue
+            timestamp = time.time_ns()
+
+            filtered = value
+            if self.FILTER is not None:
+                filtered = self.FILTER.update(value)
+            if self.PAIR:
+                # Track the sensor 2 reference used by HX711_2.to_grams(), as read_running_average() does
+                self.HX.AOFFSET = (self.HX.AOFFSET + value_2) / 2.0
+            if filtered is None: # Decimated by the filter
+                continue
+            self.GRAMS = self.HX.to_grams(filtered)
+
+            message = MESSAGE.pack(self.SEQ & 0xFFFFFFFF, timestamp, int(value), int(value_2), self.GRAMS)
+            loop.call_soon_threadsafe(self._publish, self.SEQ, message)
+            self.SEQ += 1
+
+
+    def _publish(self, seq, message):
+        if self.SOCKET is not None:
+            try:
+                self.SOCKET.sendto(message, self.MULTICAST)
+            except OSError:
+                pass # No route (e.g. network down), multicast is best effort
+        for client in self.CLIENTS:
+            client.offer(seq, message)
+
+
+    async def _subscriptions(self, reader, client):
+        try:
+            while True:
+                data = await reader.readexactly(SUBSCRIBE.size)
+                client.DECIMATE = max(1, SUBSCRIBE.unpack(data)[0])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+    async def _serve(self, reader, writer):
+        client = Client(writer, self.QUEUE_SIZE)
+        client.TASK = asyncio.current_task()
+        self.CLIENTS.add(client)
+        subscriptions = asyncio.ensure_future(self._subscriptions(reader, client))
+        queue = client.QUEUE
+        try:
+            while not subscriptions.done():
+                messages = [await queue.get()]
+                while not queue.empty(): # Batch what is queued into one write
+                    messages.append(queue.get_nowait())
+                if None in messages: # Server stopped
+                    break
+                writer.write(b"".join(messages))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.CLIENTS.discard(client)
+            subscriptions.cancel()
+            writer.close()
+
+
+    async def run(self):
+        """
+        Serve until stop() is called
+        """
+        loop = asyncio.get_running_loop()
+        server = None
+        if self.HOST is not None:
+            server = await asyncio.start_server(self._serve, self.HOST, self.PORT)
+
+        self._running = True
+        self._thread  = threading.Thread(target=self._acquire, args=(loop,), name="HX711-server")
+        self._thread.daemon = True
+        self._thread.start()
+        try:
+            while self._running and self._thread.is_alive():
+                await asyncio.sleep(0.1)
+        finally:
+            self._running = False
+            if server is not None:
+                server.close()
+                clients = list(self.CLIENTS)
+                for client in clients:
+                    client.put(None)
+                await asyncio.gather(*[client.TASK for client in clients], return_exceptions=True)
+                await server.wait_closed()
+            await loop.run_in_executor(None, self._thread.join)
+
+
+    def stop(self):
+        self._running = False
+
+
+# Clients
+
+async def subscribe(host, port=7711, decimate=1):
+    """
+    Async generator of the samples of a server, see MESSAGE
+    :param decimate: every n-th sample
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(SUBSCRIBE.pack(decimate))
+    try:
+        while True:
+            yield MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    finally:
+        writer.close()
+
+
+def listen(group, port, interface="0.0.0.0"):
+    """
+    Generator of the samples sent to a multicast group, see MESSAGE
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    membership = socket.inet_aton(group) + socket.inet_aton(interface)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    try:
+        while True:
+            data = sock.recv(MESSAGE.size)
+            if len(data) == MESSAGE.size:
+                yield MESSAGE.unpack(data)
+    finally:
+        sock.close()
+
+
+##################################
+
+def _address(text, port):
+    host, _, p = text.partition(":")
+    return host, int(p) if p else port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HX711 network server")
+    parser.add_argument("--dout", type=int, default=5)
+    parser.add_argument("--pd-sck", type=int, default=6)
+    parser.add_argument("--dout-2", type=int, help="HX711_2: DOUT pin of sensor 2 (offset reference)")
+    parser.add_argument("--pd-sck-2", type=int, default=21)
+    parser.add_argument("--offset", type=float, default=0)
+    parser.add_argument("--ratio", type=float, default=1)
+    parser.add_argument("--sim", metavar="FILE", help="simulated sensor replaying a data_*.txt file")
+    parser.add_argument("--sim-2", metavar="FILE", help="HX711_2: simulated sensor 2, default --sim")
+    parser.add_argument("--rate", type=float, default=80, help="simulated sample rate")
+    parser.add_argument("--port", type=int, default=7711, help="TCP port")
+    parser.add_argument("--multicast", metavar="GROUP:PORT", help="e.g. 239.0.0.71:7712")
+    parser.add_argument("--client", metavar="HOST:PORT", help="print the samples of a server")
+    parser.add_argument("--decimate", type=int, default=1)
+    parser.add_argument("--listen", metavar="GROUP:PORT", help="print the samples sent to a multicast group")
+    args = parser.parse_args()
+
+    if args.client:
+        async def show():
+            async for seq, t_ns, value, value_2, grams in subscribe(*_address(args.client, 7711), decimate=args.decimate):
+                print( "%d %d %d %.2f" % (seq, t_ns, value, grams) )
+        asyncio.run(show())
+        return
+
+    if args.listen:
+        for seq, t_ns, value, value_2, grams in listen(*_address(args.listen, 7712)):
+            print( "%d %d %d %.2f" % (seq, t_ns, value, grams) )
+        return
+
+    gpio = None
+    if args.sim:
+        from hx711_sim import SimulatedGPIO, SimulatedHX711, load_counts
+        chips = [SimulatedHX711(args.dout, args.pd_sck, load_counts(args.sim), rate=args.rate)]
+        if args.dout_2 is not None:
+            chips.append(SimulatedHX711(args.dout_2, args.pd_sck_2, load_counts(args.sim_2 or args.sim), rate=args.rate))
+        gpio = SimulatedGPIO(*chips)
+
+    if args.dout_2 is not None:
+        from hx711_2 import HX711_2
+        hx = HX711_2(args.dout, args.pd_sck, args.dout_2, args.pd_sck_2, gpio=gpio)
+        hx.set_offset(args.offset)
+        hx.set_ratio(args.ratio)
+    else:
+        from hx711 import HX711
+        hx = HX711(args.dout, args.pd_sck, gpio=gpio)
+        hx.set_offset(args.offset)
+        hx.set_ratios((args.offset, args.ratio))
+
+    multicast = _address(args.multicast, 7712) if args.multicast else None
+    server = Server(hx, port=args.port, multicast=multicast)
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Settling detector: report a stable weight as soon as the load stops moving
+
+Tracks the slope (least squares fit) and the standard deviation of the latest
+`window` weights. When both are below their limits, the weight is stable and
+the mean of the window is reported, once; the detector re-arms when the mean
+moves away from the reported weight.
+
+The window size is the tradeoff between time-to-stable and accuracy: a short
+window reports earlier, a long one averages more noise away (the error of the
+reported weight is about max_std / sqrt(window)).
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import math
+import time
+from collections import deque
+
+
+class SettlingDetector:
+
+    def __init__(self, window=8, max_std=0.5, max_slope=2.0, motion=None, on_stable=None):
+        """
+        :param window: number of weights the criteria are evaluated over
+        :param max_std: maximum standard deviation of the weights [g]
+        :param max_slope: maximum slope of the weights [g/s]
+        :param motion: change of the mean from the stable weight which re-arms the detector [g],
+                       default 3 * max_std (hysteresis, noise does not re-trigger)
+        :param on_stable: callback(weight), called when the weight becomes stable
+        """
+        if window < 3:
+            raise ValueError("The window needs at least 3 weights")
+
+        self.WINDOW    = window
+        self.MAX_STD   = max_std
+        self.MAX_SLOPE = max_slope
+        self.MOTION    = motion if motion is not None else 3 * max_std
+        self.ON_STABLE = on_stable
+
+        self.WEIGHTS = deque(maxlen=window)
+        self.TIMES   = deque(maxlen=window)
+        self.STABLE  = None # Reported weight while stable, None while moving
+        self.STD     = None
+        self.SLOPE   = None
+
+
+    def reset(self):
+        self.WEIGHTS.clear()
+        self.TIMES.clear()
+        self.STABLE = None
+
+
+    def add(self, grams, timestamp=None):
+        """
+        Add a weight
+        :param grams: weight
+        :param timestamp: time of the weight [s], default time.monotonic()
+        :return the settled weight when it just became stable, else None
+        """
+        self.WEIGHTS.append(grams)
+        self.TIMES.append(time.monotonic() if timestamp is None else timestamp)
+
+        n = len(self.WEIGHTS)
+        if n < self.WINDOW:
+            return None
+
+        # Mean, standard deviation and least squares slope of the window
+        w_mean = sum(self.WEIGHTS) / n
+        t_mean = sum(self.TIMES) / n
+        s_tw = s_tt = s_ww = 0.0
+        for t, w in zip(self.TIMES, self.WEIGHTS):
+            dt = t - t_mean
+            dw = w - w_mean
+            s_tw += dt * dw
+            s_tt += dt * dt
+            s_ww += dw * dw
+        self.STD   = math.sqrt(s_ww / (n - 1))
+        self.SLOPE = s_tw / s_tt if s_tt > 0 else 0.0
+
+        if self.STABLE is not None:
+            if abs(w_mean - self.STABLE) > self.MOTION:
+                self.STABLE = None # Moving again
+            return None
+
+        if self.STD <= self.MAX_STD and abs(self.SLOPE) <= self.MAX_SLOPE:
+            self.STABLE = w_mean
+            if self.ON_STABLE is not None:
+                self.ON_STABLE(w_mean)
+            return w_mean
+        return None
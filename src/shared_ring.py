@@ -0,0 +1,190 @@
+"""
+Share one scale between processes through a shared memory ring buffer
+
+Only one process may drive the HX711 pins. The publisher runs the acquisition
+and writes every sample (raw sensor data and grams) into a
+multiprocessing.shared_memory ring buffer; any number of local readers attach
+to it and get the latest samples without touching GPIO or any IPC round-trip.
+
+    # Owner of the pins
+    publisher = Publisher(hx, "scale1", filter=Kalman(q=100, r=300**2))
+    publisher.start()
+
+    # Dashboard, logger, ...
+    reader = Reader("scale1")
+    seq, t_ns, count, grams = reader.latest()
+    for seq, t_ns, count, grams in reader.follow(): ...
+
+Layout (native byte order):
+    header  - 32 bytes: magic "HX711SHM", slots (uint32), reserved (uint32),
+              sequence number of the next sample (uint64), reserved (uint64)
+    slots   - sequence number (int64), timestamp in ns (int64), raw sensor data (int64), grams (double)
+
+A slot's sequence number is set to -1 while it is written, so a reader
+detects a slot overwritten under it (seqlock) and retries.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+
+MAGIC  = b"HX711SHM"
+HEADER = struct.Struct("=8sIIQQ")
+SEQ_OFFSET = 16 # Offset of the sequence number in the header
+SLOT   = struct.Struct("=qqqd")
+SEQ    = struct.Struct("=q")
+
+
+class Publisher:
+
+    def __init__(self, hx, name="hx711", size=1024, filter=None):
+        """
+        :param hx: HX711 object, owned by this process
+        :param name: shared memory block name, used by the readers
+        :param size: number of slots
+        :param filter: optional filter stage (see filters.py) applied before the conversion to grams
+        """
+        self.HX     = hx
+        self.SIZE   = size
+        self.FILTER = filter
+        self.SEQ    = 0
+        self.GRAMS  = 0.0
+
+        self.SHM = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + size * SLOT.size)
+        self.BUF = self.SHM.buf
+        HEADER.pack_into(self.BUF, 0, MAGIC, size, 0, 0, 0)
+
+
+    def __call__(self, count):
+        """
+        HX711 listener: publish a raw sample
+        """
+        value = count
+        if self.FILTER is not None:
+            value = self.FILTER.update(count)
+        if value is not None: # Decimation: keep the last weight
+            self.GRAMS = self.HX.to_grams(value)
+        self.publish(time.time_ns(), count, self.GRAMS)
+
+
+    def publish(self, timestamp_ns, count, grams):
+        buf  = self.BUF
+        seq  = self.SEQ
+        slot = HEADER.size + (seq % self.SIZE) * SLOT.size
+
+        SEQ.pack_into(buf, slot, -1) # Being written
+        SLOT.pack_into(buf, slot, -1, timestamp_ns, count, grams)
+        SEQ.pack_into(buf, slot, seq)
+
+        self.SEQ = seq + 1
+        struct.pack_into("=Q", buf, SEQ_OFFSET, self.SEQ)
+
+
+    def start(self, size=256):
+        """
+        Start the background acquisition of the HX711 and publish each sample
+        """
+        self.HX.add_listener(self)
+        self.HX.start_acquisition(size)
+
+
+    def stop(self):
+        self.HX.stop_acquisition()
+        self.HX.remove_listener(self)
+
+
+    def close(self):
+        """
+        Stop publishing and remove the shared memory block
+        """
+        self.stop()
+        self.BUF = None
+        self.SHM.close()
+        self.SHM.unlink()
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        pass
+    # Without this, the resource tracker unlinks the block when the reader exits
+    from multiprocessing import resource_tracker
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class Reader:
+
+    def __init__(self, name="hx711"):
+        self.SHM = _attach(name)
+        self.BUF = self.SHM.buf
+
+        magic, size, _, _, _ = HEADER.unpack_from(self.BUF, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a HX711 shared memory block" % name)
+        self.SIZE = size
+
+
+    def sequence(self):
+        """
+        Sequence number of the next sample to be published (= number of samples published)
+        """
+        return struct.unpack_from("=Q", self.BUF, SEQ_OFFSET)[0]
+
+
+    def get(self, seq):
+        """
+        :return (sequence number, timestamp in ns, raw sensor data, grams),
+                None if the sample was overwritten or is not published yet
+        """
+        slot = HEADER.size + (seq % self.SIZE) * SLOT.size
+        record = SLOT.unpack_from(self.BUF, slot)
+        if record[0] != seq or SEQ.unpack_from(self.BUF, slot)[0] != seq:
+            return None
+        return record
+
+
+    def latest(self):
+        """
+        :return the latest sample, see get(); None if nothing is published yet
+        """
+        while True:
+            seq = self.sequence()
+            if seq == 0:
+                return None
+            record = self.get(seq - 1)
+            if record is not None:
+                return record # Else overwritten while reading, try again
+
+
+    def follow(self, seq=None, poll=0.001):
+        """
+        Yield each new sample, see get(). A reader falling more than `size`
+        samples behind skips to the oldest sample still in the buffer.
+        :param seq: first sequence number, None - the next published one
+        :param poll: seconds between checks for new samples
+        """
+        if seq is None:
+            seq = self.sequence()
+        while True:
+            end = self.sequence()
+            if end <= seq:
+                time.sleep(poll)
+                continue
+            seq = max(seq, end - self.SIZE + 1)
+            record = self.get(seq)
+            if record is None: # Overwritten: fell behind
+                continue
+            seq += 1
+            yield record
+
+
+    def close(self):
+        self.BUF = None
+        self.SHM.close()
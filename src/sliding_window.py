@@ -0,0 +1,105 @@
+"""
+Sliding window robust estimators (trimmed mean, median) for streaming sensor data
+
+The window is kept sorted: a new sample is inserted and the oldest one evicted
+with a binary search (bisect), and the sum of the non-trimmed middle part is
+updated incrementally, so no sorting and no summing of the whole window is done
+per sample. This allows wide windows (100+ samples) at a constant cost.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import bisect
+from collections import deque
+
+
+class SlidingWindow:
+
+    def __init__(self, size=100, trim=0.2):
+        """
+        :param size: number of samples in the window
+        :param trim: fraction of the samples discarded at each end, see HX711.no_spikes()
+        """
+        self.SIZE = size
+        self.TRIM = trim
+        self.CUT  = int(size * trim) # samples discarded at each end of the full window
+
+        self._fifo   = deque()
+        self._sorted = []
+        self._middle = 0 # Sum of _sorted[CUT:SIZE-CUT] once the window is full
+        self._resync = 0 # Updates until the middle sum is recalculated (float rounding)
+
+
+    def __len__(self):
+        return len(self._sorted)
+
+
+    def add(self, value):
+        """
+        Add a sample, evict the oldest one when the window is full
+        """
+        S = self._sorted
+        n = len(S)
+        self._fifo.append(value)
+
+        if n < self.SIZE: # Filling the window
+            bisect.insort(S, value)
+            if len(S) == self.SIZE:
+                self._sum_middle()
+            return
+
+        old = self._fifo.popleft()
+        a   = self.CUT
+        b   = n - a
+
+        if a == 0:
+            self._middle += value - old
+            del S[bisect.bisect_left(S, old)]
+            bisect.insort(S, value)
+            return
+
+        # Evict, then insert, updating the sum of S[a:b] for the element shifts
+        q = bisect.bisect_left(S, old)
+        if q < a:
+            self._middle += S[b] - S[a]
+        elif q < b:
+            self._middle += S[b] - S[q]
+        del S[q]
+
+        p = bisect.bisect_right(S, value)
+        if p < a:
+            self._middle += S[a-1] - S[b-1]
+        elif p < b:
+            self._middle += value - S[b-1]
+        S.insert(p, value)
+
+        self._resync -= 1
+        if self._resync <= 0:
+            self._sum_middle()
+
+
+    def _sum_middle(self):
+        self._middle = sum(self._sorted[self.CUT:self.SIZE-self.CUT])
+        self._resync = self.SIZE
+
+
+    def trimmed_mean(self):
+        """
+        Mean of the window without the lowest and highest TRIM fraction
+        """
+        n = len(self._sorted)
+        if n == self.SIZE:
+            return self._middle / (n - 2 * self.CUT)
+
+        cut = int(n * self.TRIM) # Window not full yet
+        return sum(self._sorted[cut:n-cut]) / (n - 2 * cut)
+
+
+    def median(self):
+        S = self._sorted
+        n = len(S)
+        if n % 2:
+            return S[n//2]
+        return (S[n//2 - 1] + S[n//2]) / 2.0
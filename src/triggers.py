@@ -0,0 +1,207 @@
+"""
+Triggers evaluated on every raw sample
+
+Triggers are checked in the read path (a HX711 listener, i.e. in the
+acquisition thread in acquisition mode), so they fire within one conversion
+of the condition instead of after a read_average*() worth of samples. The
+callbacks run on a dedicated thread, a slow callback does not delay the
+acquisition; the delay from the detection to the callback is measured.
+
+    hx.add_trigger(Threshold(500, callback=lambda e: print(e.grams)))
+    hx.add_trigger(RateLimit(200, callback=alarm))         # > 200 g/s
+    fill = Target(1000, preact=35, callback=close_valve)   # fires at 1000 - 35 g
+    hx.add_trigger(fill)
+    hx.start_acquisition()
+    ...
+    fill.learn(final_weight)                               # adapt the preact
+    print( hx.TRIGGERS.latency() )
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import queue
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+from running_stats import RunningStats
+
+# time: time.perf_counter() at the detection
+Event = namedtuple("Event", "trigger grams count time")
+
+
+class Threshold:
+    """ Level crossing with hysteresis """
+
+    def __init__(self, level, rising=True, hysteresis=0.5, callback=None):
+        """
+        :param level: grams
+        :param rising: fire when the weight rises above the level, else when it falls below
+        :param hysteresis: grams back across the level needed to re-arm
+        :param callback: callback(Event)
+        """
+        self.LEVEL      = level
+        self.RISING     = rising
+        self.HYSTERESIS = hysteresis
+        self.CALLBACK   = callback
+        self.ARMED      = None # Armed once the weight is on the arming side
+
+
+    def check(self, grams, t):
+        if self.RISING:
+            crossed = grams >= self.LEVEL
+            rearm   = grams < self.LEVEL - self.HYSTERESIS
+        else:
+            crossed = grams <= self.LEVEL
+            rearm   = grams > self.LEVEL + self.HYSTERESIS
+
+        if rearm:
+            self.ARMED = True
+        elif crossed and self.ARMED:
+            self.ARMED = False
+            return True
+        return False
+
+
+class RateLimit:
+    """ Rate of change above a limit, e.g. overflow or a dropped load """
+
+    def __init__(self, limit, samples=4, callback=None):
+        """
+        :param limit: grams per second, either direction
+        :param samples: rate measured over this number of samples, fewer are noisier
+        :param callback: callback(Event)
+        """
+        self.LIMIT    = limit
+        self.SAMPLES  = samples
+        self.CALLBACK = callback
+        self._history = []
+        self._active  = False
+
+
+    def check(self, grams, t):
+        history = self._history
+        history.append((t, grams))
+        if len(history) <= self.SAMPLES:
+            return False
+        t0, g0 = history.pop(0)
+        rate = abs(grams - g0) / (t - t0) if t > t0 else 0.0
+
+        if rate <= self.LIMIT:
+            self._active = False
+            return False
+        if self._active:
+            return False
+        self._active = True
+        return True
+
+
+class Target(Threshold):
+    """
+    Filling/dosing cut-off: fires at target - preact, the preact being the
+    material still in flight when the valve closes
+    """
+
+    def __init__(self, target, preact=0.0, hysteresis=0.5, learn_rate=0.5, callback=None):
+        """
+        :param target: grams
+        :param preact: grams before the target to fire
+        :param learn_rate: fraction of the overshoot added to the preact by learn()
+        """
+        Threshold.__init__(self, target - preact, True, hysteresis, callback)
+        self.TARGET     = target
+        self.PREACT     = preact
+        self.LEARN_RATE = learn_rate
+
+
+    def set_preact(self, preact):
+        self.PREACT = preact
+        self.LEVEL  = self.TARGET - preact
+
+
+    def learn(self, final):
+        """
+        Adapt the preact to the settled weight of the last fill
+        """
+        self.set_preact(self.PREACT + self.LEARN_RATE * (final - self.TARGET))
+
+
+class TriggerSet:
+    """ HX711 listener checking the triggers, callbacks on a dispatcher thread """
+
+    def __init__(self, hx, filter=None):
+        """
+        :param hx: HX711 object, for the conversion to grams
+        :param filter: optional filter stage (see filters.py) applied to each sample before the checks
+        """
+        self.HX       = hx
+        self.FILTER   = filter
+        self.TRIGGERS = []
+        self.LATENCY  = RunningStats() # Seconds from the detection to the callback
+        self.MAX_LATENCY = 0.0
+        self.ERRORS      = 0    # Callbacks which raised an exception
+        self.LAST_ERROR  = None
+
+        self._queue  = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._dispatch, name="HX711-triggers")
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def add(self, trigger):
+        self.TRIGGERS = self.TRIGGERS + [trigger] # Copy, the list may be in use by __call__()
+
+
+    def remove(self, trigger):
+        self.TRIGGERS = [t for t in self.TRIGGERS if t is not trigger]
+
+
+    def __call__(self, count):
+        value = count
+        if self.FILTER is not None:
+            value = self.FILTER.update(count)
+            if value is None:
+                return
+        grams = self.HX.to_grams(value)
+        t = time.perf_counter()
+        for trigger in self.TRIGGERS:
+            if trigger.check(grams, t):
+                self._queue.put(Event(trigger, grams, count, t))
+
+
+    def _dispatch(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            latency = time.perf_counter() - event.time
+            self.LATENCY.add(latency)
+            self.MAX_LATENCY = max(self.MAX_LATENCY, latency)
+            if event.trigger.CALLBACK is None:
+                continue
+            try:
+                event.trigger.CALLBACK(event)
+            except Exception as e: # Keep dispatching the other triggers' events
+                self.ERRORS    += 1
+                self.LAST_ERROR = e
+                traceback.print_exc()
+
+
+    def latency(self):
+        """
+        :return {"n", "mean", "std", "max"} of the detection to callback delay in seconds,
+                "errors": number of callbacks which raised an exception
+        """
+        return {"n": self.LATENCY.N, "mean": self.LATENCY.MEAN,
+                "std": self.LATENCY.std(), "max": self.MAX_LATENCY, "errors": self.ERRORS}
+
+
+    def close(self):
+        """
+        Stop the dispatcher thread after the pending callbacks
+        """
+        self._queue.put(None)
+        self._thread.join()
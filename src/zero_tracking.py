@@ -0,0 +1,94 @@
+"""
+Automatic zero tracking (as on legal-for-trade scales)
+
+When the average weight over `hold` seconds is within `band` grams of zero,
+the offset is moved towards that average. An offset set outside the tracker
+(tare(), set_offset()) is a new zero, not drift: the limit counts from there. The samples are taken
+from the ones read anyway (HX711 listener), so drift is compensated without
+pausing the scale for a tare().
+
+    tracker = ZeroTracker(hx, band=0.5, hold=1.0)
+    tracker.start()
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+"""
+import time
+
+
+class ZeroTracker:
+
+    def __init__(self, hx, band=0.5, hold=1.0, rate=0.5, limit=None):
+        """
+        :param hx: HX711 object
+        :param band: weights within +-band grams count as zero
+        :param hold: seconds the weight has to stay at zero before the offset is updated
+        :param rate: fraction of the measured zero error corrected per update, 0 < rate <= 1
+        :param limit: maximum total correction in grams (e.g. 2% of the capacity), None - no limit
+        """
+        self.HX    = hx
+        self.BAND  = band
+        self.HOLD  = hold
+        self.RATE  = rate
+        self.LIMIT = limit
+
+        self.ORIGIN  = hx.OFFSET # Offset when tracking started or at the last tare()
+        self.UPDATES = 0
+
+        self._offset = hx.OFFSET # Offset last set by the tracker
+
+        self._since = None # Start of the current zero period
+        self._sum   = 0
+        self._n     = 0
+
+
+    def start(self):
+        self.ORIGIN  = self.HX.OFFSET
+        self._offset = self.HX.OFFSET
+        self._since  = None
+        self.HX.add_listener(self)
+
+
+    def stop(self):
+        self.HX.remove_listener(self)
+
+
+    def __call__(self, count):
+        """
+        Listener, called with each raw sample
+        """
+        hx  = self.HX
+        now = time.monotonic()
+
+        if hx.OFFSET != self._offset:
+            # Offset changed outside the tracker, e.g. a container tared: track from the new zero
+            self.ORIGIN  = hx.OFFSET
+            self._offset = hx.OFFSET
+            self._since  = None
+
+        if self._since is None:
+            self._since = now
+            self._sum   = 0
+            self._n     = 0
+
+        self._sum += count
+        self._n   += 1
+        if now - self._since < self.HOLD:
+            return
+
+        self._since = None
+        mean = self._sum / float(self._n)
+        if abs(hx.to_grams(mean)) > self.BAND:
+            return # Not at zero, single noisy samples may be outside the band
+
+        offset = hx.OFFSET + self.RATE * (mean - hx.OFFSET)
+        if self.LIMIT is not None:
+            # Clamp the total correction to LIMIT grams
+            max_counts = self.LIMIT * abs(hx.get_interpolated_ratio(offset))
+            offset = min(max(offset, self.ORIGIN - max_counts), self.ORIGIN + max_counts)
+
+        hx.set_offset(offset)
+        self._offset  = offset
+        self.UPDATES += 1